@@ -1,15 +1,40 @@
 # app/__init__.py
+from importlib import import_module
 from flask import Flask
 from flask_cors import CORS
 from app.extensions import db, jwt, migrate, ma, cache, limiter
 from app.config import Config
+from app.utils.json_provider import OrjsonProvider
 
 
+# Реестр blueprints: имя -> (модуль, атрибут, url_prefix)
+BLUEPRINTS = {
+    'auth': ('app.blueprints.auth', 'bp', '/api/auth'),
+    'users': ('app.blueprints.users', 'bp', '/api/users'),
+    'listings': ('app.blueprints.listings', 'bp', '/api/listings'),
+    'cars': ('app.blueprints.cars', 'bp', '/api/cars'),
+    'locations': ('app.blueprints.locations', 'bp', '/api/locations'),
+    'conversations': ('app.blueprints.conversations', 'bp', '/api/conversations'),
+    'media': ('app.blueprints.media', 'bp', '/api/media'),
+    'notifications': ('app.blueprints.notifications', 'notifications_bp', '/api/notifications'),
+    'payments': ('app.blueprints.payments', 'payments_bp', '/api/payments'),
+    'admin': ('app.blueprints.admin', 'bp', '/api/admin'),
+    'support': ('app.blueprints.support', 'support_bp', '/api/support'),
+}
 
 
-def create_app(config_class=Config):
-    """Factory function для создания Flask приложения"""
+def create_app(config_class=Config, blueprints=None):
+    """
+    Factory function для создания Flask приложения
+    
+    Args:
+        config_class: Класс конфигурации
+        blueprints: Имена blueprints из BLUEPRINTS для регистрации
+            (по умолчанию регистрируются все). Модули остальных
+            blueprints не импортируются.
+    """
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config.from_object(config_class)
     
     # Инициализация расширений
@@ -21,30 +46,12 @@ def create_app(config_class=Config):
     limiter.init_app(app)
     CORS(app)
     
-    # Регистрация blueprints
-    from app.blueprints.auth import bp as auth_bp
-    from app.blueprints.users import bp as users_bp
-    from app.blueprints.listings import bp as listings_bp
-    from app.blueprints.cars import bp as cars_bp
-    from app.blueprints.locations import bp as locations_bp
-    from app.blueprints.conversations import bp as conversations_bp
-    from app.blueprints.media import bp as media_bp
-    from app.blueprints.notifications import notifications_bp
-    from app.blueprints.payments import payments_bp
-    from app.blueprints.admin import bp as admin_bp
-    from app.blueprints.support import support_bp
+    # Celery с брокером из конфигурации и контекстом приложения
+    from app.tasks import init_celery
+    init_celery(app)
     
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(users_bp, url_prefix='/api/users')
-    app.register_blueprint(listings_bp, url_prefix='/api/listings')
-    app.register_blueprint(cars_bp, url_prefix='/api/cars')
-    app.register_blueprint(locations_bp, url_prefix='/api/locations')
-    app.register_blueprint(conversations_bp, url_prefix='/api/conversations')
-    app.register_blueprint(media_bp, url_prefix='/api/media')
-    app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
-    app.register_blueprint(payments_bp, url_prefix='/api/payments')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin')
-    app.register_blueprint(support_bp, url_prefix='/api/support')
+    # Регистрация blueprints
+    register_blueprints(app, blueprints)
     
     # Регистрация обработчиков ошибок
     register_error_handlers(app)
@@ -55,28 +62,48 @@ def create_app(config_class=Config):
     return app
 
 
+def register_blueprints(app, names=None):
+    """Импорт и регистрация blueprints по реестру"""
+    for name in (names if names is not None else BLUEPRINTS):
+        module_path, attr, url_prefix = BLUEPRINTS[name]
+        blueprint = getattr(import_module(module_path), attr)
+        app.register_blueprint(blueprint, url_prefix=url_prefix)
+
+
 def register_error_handlers(app):
     """Регистрация обработчиков ошибок"""
-    from flask import jsonify
-    from werkzeug.exceptions import HTTPException
+    import orjson
+    from flask import Response
     from app.utils.exceptions import ValidationError, AuthenticationError, AuthorizationError
     
-    @app.errorhandler(ValidationError)
-    def handle_validation_error(e):
-        return jsonify({'error': 'Validation error', 'message': str(e)}), 400
+    # Исключение -> (заголовок ошибки, HTTP статус); сообщение берется из исключения
+    exception_errors = {
+        ValidationError: ('Validation error', 400),
+        AuthenticationError: ('Authentication error', 401),
+        AuthorizationError: ('Authorization error', 403),
+    }
+    
+    # Тела ответов без динамических данных сериализуются один раз
+    static_bodies = {
+        404: orjson.dumps({'error': 'Not found', 'message': 'Resource not found'}),
+        500: orjson.dumps({'error': 'Internal server error', 'message': 'Something went wrong'}),
+    }
     
-    @app.errorhandler(AuthenticationError)
-    def handle_authentication_error(e):
-        return jsonify({'error': 'Authentication error', 'message': str(e)}), 401
+    def make_exception_handler(error, status):
+        def handler(e):
+            body = orjson.dumps({'error': error, 'message': str(e)})
+            return Response(body, status=status, mimetype='application/json')
+        return handler
     
-    @app.errorhandler(AuthorizationError)
-    def handle_authorization_error(e):
-        return jsonify({'error': 'Authorization error', 'message': str(e)}), 403
+    def make_static_handler(status):
+        body = static_bodies[status]
+        
+        def handler(e):
+            return Response(body, status=status, mimetype='application/json')
+        return handler
     
-    @app.errorhandler(404)
-    def handle_not_found(e):
-        return jsonify({'error': 'Not found', 'message': 'Resource not found'}), 404
+    for exc_class, (error, status) in exception_errors.items():
+        app.register_error_handler(exc_class, make_exception_handler(error, status))
     
-    @app.errorhandler(500)
-    def handle_internal_error(e):
-        return jsonify({'error': 'Internal server error', 'message': 'Something went wrong'}), 500
\ No newline at end of file
+    for status in static_bodies:
+        app.register_error_handler(status, make_static_handler(status))
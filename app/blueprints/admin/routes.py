@@ -2,20 +2,23 @@
 from flask import request, jsonify, g
 from app.blueprints.admin import bp
 from app.blueprints.admin.services import AdminService
+from app.models.moderation import ModerationQueue
 from app.blueprints.admin.schemas import (
-    ModerationActionSchema, ReportContentSchema, ResolveReportSchema,
-    UserActionSchema, AdminStatsSchema
+    ModerationActionSchema, BulkModerationActionSchema, ReportContentSchema, ResolveReportSchema,
+    UserActionSchema, admin_stats_schema
 )
 from app.utils.decorators import (
-    handle_errors, admin_required, validate_json, paginate, cache_response
+    handle_errors, admin_required, validate_json, paginate
 )
-from app.utils.pagination import create_pagination_response
+from app.utils.pagination import create_pagination_response, create_keyset_pagination_response
+
+# Форма действия модерации для сообщений ответа
+MODERATION_ACTION_PAST = {'approve': 'approved', 'reject': 'rejected'}
 
 
 @bp.route('/dashboard', methods=['GET'])
 @handle_errors
 @admin_required
-@cache_response(timeout=300)
 def get_dashboard():
     """Получение данных для дашборда"""
     stats = AdminService.get_dashboard_stats()
@@ -31,18 +34,30 @@ def get_dashboard():
 @admin_required
 @paginate()
 def get_moderation_queue():
-    """Получение очереди модерации"""
+    """
+    Получение очереди модерации
+    
+    Поддерживает keyset пагинацию: ?after=<next_cursor> (пустой ?after=
+    для первой страницы) вместо ?page=.
+    """
     status = request.args.get('status')
     priority = request.args.get('priority', type=int)
+    after = request.args.get('after')
     
     pagination = AdminService.get_moderation_queue(
         page=g.pagination['page'],
         per_page=g.pagination['per_page'],
         status=status,
-        priority=priority
+        priority=priority,
+        after=after
     )
     
-    response = create_pagination_response(pagination)
+    items = [ModerationQueue.row_to_dict(row) for row in pagination.items]
+    
+    if after is not None:
+        response = create_keyset_pagination_response(pagination, items=items)
+    else:
+        response = create_pagination_response(pagination, items=items)
     
     return jsonify(response)
 
@@ -65,7 +80,33 @@ def moderate_content(moderation_id):
     
     return jsonify(
         data=result.to_dict(),
-        message=f"Content {data['action']}d successfully"
+        message=f"Content {MODERATION_ACTION_PAST[data['action']]} successfully"
+    )
+
+
+@bp.route('/moderation/bulk', methods=['POST'])
+@handle_errors
+@admin_required
+@validate_json(BulkModerationActionSchema)
+def moderate_content_bulk():
+    """Массовая модерация контента"""
+    data = g.validated_data
+    
+    moderation_ids = AdminService.moderate_content_bulk(
+        moderation_ids=data['moderation_ids'],
+        moderator_id=g.current_user.user_id,
+        action=data['action'],
+        reason=data.get('reason'),
+        notes=data.get('notes'),
+        moderator=g.current_user
+    )
+    
+    status = MODERATION_ACTION_PAST[data['action']]
+    
+    # Только ID и новый статус: без повторной загрузки элементов после commit
+    return jsonify(
+        data={'moderation_ids': moderation_ids, 'status': status},
+        message=f"{len(moderation_ids)} items {status} successfully"
     )
 
 
@@ -74,18 +115,27 @@ def moderate_content(moderation_id):
 @admin_required
 @paginate()
 def get_reports():
-    """Получение жалоб"""
+    """
+    Получение жалоб
+    
+    Поддерживает keyset пагинацию через ?after=<next_cursor>.
+    """
     status = request.args.get('status')
     reason = request.args.get('reason')
+    after = request.args.get('after')
     
     pagination = AdminService.get_reports(
         page=g.pagination['page'],
         per_page=g.pagination['per_page'],
         status=status,
-        reason=reason
+        reason=reason,
+        after=after
     )
     
-    response = create_pagination_response(pagination)
+    if after is not None:
+        response = create_keyset_pagination_response(pagination)
+    else:
+        response = create_pagination_response(pagination)
     
     return jsonify(response)
 
@@ -138,20 +188,29 @@ def resolve_report(report_id):
 @admin_required
 @paginate()
 def get_users():
-    """Получение пользователей для администрирования"""
+    """
+    Получение пользователей для администрирования
+    
+    Поддерживает keyset пагинацию через ?after=<next_cursor>.
+    """
     user_type = request.args.get('user_type')
     status = request.args.get('status')
     search = request.args.get('search')
+    after = request.args.get('after')
     
     pagination = AdminService.get_users(
         page=g.pagination['page'],
         per_page=g.pagination['per_page'],
         user_type=user_type,
         status=status,
-        search=search
+        search=search,
+        after=after
     )
     
-    response = create_pagination_response(pagination)
+    if after is not None:
+        response = create_keyset_pagination_response(pagination)
+    else:
+        response = create_pagination_response(pagination)
     
     return jsonify(response)
 
@@ -169,7 +228,8 @@ def perform_user_action(user_id):
         admin_id=g.current_user.user_id,
         action=data['action'],
         reason=data.get('reason'),
-        duration_days=data.get('duration_days')
+        duration_days=data.get('duration_days'),
+        admin=g.current_user
     )
     
     return jsonify(
@@ -182,8 +242,13 @@ def perform_user_action(user_id):
 @handle_errors
 @admin_required
 def get_system_health():
-    """Получение состояния системы"""
-    health = AdminService.get_system_health()
+    """
+    Получение состояния системы
+    
+    ?deep=1 дополнительно выполняет проверочный запрос к БД.
+    """
+    deep = request.args.get('deep', type=int) == 1
+    health = AdminService.get_system_health(deep=deep)
     
     return jsonify(
         data=health,
@@ -194,13 +259,11 @@ def get_system_health():
 @bp.route('/stats', methods=['GET'])
 @handle_errors
 @admin_required
-@cache_response(timeout=600)
 def get_admin_stats():
     """Получение расширенной административной статистики"""
     stats = AdminService.get_dashboard_stats()
-    schema = AdminStatsSchema()
     
     return jsonify(
-        data=schema.dump(stats),
+        data=admin_stats_schema.dump(stats),
         message="Admin statistics retrieved successfully"
     )
\ No newline at end of file
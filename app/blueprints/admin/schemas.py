@@ -9,6 +9,11 @@ class ModerationActionSchema(Schema):
     notes = fields.Str(required=False, validate=validate.Length(max=2000))
 
 
+class BulkModerationActionSchema(ModerationActionSchema):
+    """Схема для массовых действий модерации"""
+    moderation_ids = fields.List(fields.Int(), required=True, validate=validate.Length(min=1, max=100))
+
+
 class ReportContentSchema(Schema):
     """Схема для жалобы на контент"""
     entity_id = fields.Int(required=True)
@@ -42,4 +47,8 @@ class AdminStatsSchema(Schema):
     active_listings_count = fields.Int(dump_only=True)
     new_listings_today = fields.Int(dump_only=True)
     pending_moderation_count = fields.Int(dump_only=True)
-    pending_reports_count = fields.Int(dump_only=True)
\ No newline at end of file
+    pending_reports_count = fields.Int(dump_only=True)
+
+
+# Экземпляры схем создаются один раз при импорте модуля
+admin_stats_schema = AdminStatsSchema()
@@ -1,59 +1,178 @@
 # app/blueprints/admin/services.py
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc, and_, or_
-from app.extensions import db
+from sqlalchemy import func, desc, and_, or_, case, text, update
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.extensions import db, cache
 from app.models.user import User
 from app.models.listing import Listing
 from app.models.moderation import ModerationQueue, ReportedContent
-from app.models.base import get_status_by_code
+from app.models.base import Status, GlobalEntity, get_status_by_code
 from app.utils.exceptions import NotFoundError, AuthorizationError
-from app.utils.pagination import paginate_query
+from app.utils.pagination import paginate_query, KeysetPagination
+from app.utils.helpers import get_utc_today
+
+
+# Запрос проверки БД компилируется один раз и переиспользуется из кэша компилятора
+_HEALTH_PROBE = text('SELECT 1')
+
+# Снимок счетчиков дашборда из материализованного представления admin_stats_mv;
+# устаревший снимок (задача обновления не работает) не возвращается
+_STATS_SNAPSHOT_EXISTS = text("SELECT to_regclass('admin_stats_mv') IS NOT NULL")
+_STATS_SNAPSHOT = text(
+    'SELECT users_count, new_users_today, new_users_month, listings_count, '
+    'new_listings_today, pending_moderation_count, pending_reports_count, refreshed_at '
+    'FROM admin_stats_mv '
+    'WHERE refreshed_at >= now() - make_interval(secs => :max_age)'
+)
 
 
 class AdminService:
     """Сервис для административных функций"""
     
+    DASHBOARD_STATS_CACHE_KEY = 'admin:dashboard_stats:v1'
+    DASHBOARD_STATS_CACHE_TIMEOUT = 60
+    
+    # Максимальный возраст снимка admin_stats_mv (обновляется раз в минуту)
+    STATS_SNAPSHOT_MAX_AGE = 120
+    
+    # admin_stats_mv найдено в базе; запоминается только положительный результат,
+    # чтобы представление, созданное после старта, начало использоваться
+    _stats_snapshot_available = False
+    
+    @staticmethod
+    def _get_status_id(group_code, status_code):
+        """Получение ID статуса из кэша статусов без JOIN со справочником"""
+        status = get_status_by_code(group_code, status_code)
+        return status.status_id if status else None
+    
     @staticmethod
     def get_dashboard_stats():
-        """Получение статистики для дашборда"""
-        today = datetime.utcnow().date()
+        """
+        Получение статистики для дашборда
+        
+        Результат кэшируется под общим ключом, поэтому дашборд и расширенная
+        статистика используют одну копию данных.
+        
+        Счетчики приблизительные: снимок admin_stats_mv обновляется задачей
+        refresh_admin_stats раз в минуту и используется, пока ему не больше
+        двух минут (иначе счетчики считаются по таблицам); результат еще до
+        минуты хранится в кэше. Изменения видны на дашборде с задержкой
+        до трех минут.
+        """
+        stats = cache.get(AdminService.DASHBOARD_STATS_CACHE_KEY)
+        if stats is None:
+            stats = AdminService._read_stats_snapshot() or AdminService._compute_dashboard_stats()
+            cache.set(
+                AdminService.DASHBOARD_STATS_CACHE_KEY,
+                stats,
+                timeout=AdminService.DASHBOARD_STATS_CACHE_TIMEOUT
+            )
+        
+        return stats
+    
+    @staticmethod
+    def invalidate_dashboard_stats():
+        """Сброс кэша статистики дашборда (после обновления снимка)"""
+        cache.delete(AdminService.DASHBOARD_STATS_CACHE_KEY)
+    
+    @staticmethod
+    def _read_stats_snapshot():
+        """
+        Чтение счетчиков из admin_stats_mv (одна строка вместо подсчета по таблицам)
+        
+        Returns:
+            Словарь статистики или None, если представление еще не создано
+            или снимок устарел
+        """
+        # Наличие представления проверяется без ошибки в транзакции вызывающего кода
+        if not AdminService._stats_snapshot_available:
+            if not db.session.execute(_STATS_SNAPSHOT_EXISTS).scalar():
+                return None
+            AdminService._stats_snapshot_available = True
+        
+        row = db.session.execute(
+            _STATS_SNAPSHOT, {'max_age': AdminService.STATS_SNAPSHOT_MAX_AGE}
+        ).mappings().first()
+        
+        if row is None:
+            return None
+        
+        stats = dict(row)
+        # Время снимка не входит в ответ: у подсчета по таблицам его нет
+        stats.pop('refreshed_at')
+        # Поле сохраняется для совместимости ответа API (AdminStatsSchema)
+        stats['active_listings_count'] = stats['listings_count']
+        
+        return stats
+    
+    @staticmethod
+    def refresh_stats_snapshot():
+        """Обновление admin_stats_mv без блокировки читателей"""
+        db.session.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY admin_stats_mv'))
+        db.session.commit()
+        AdminService.invalidate_dashboard_stats()
+    
+    @staticmethod
+    def _compute_dashboard_stats():
+        """
+        Подсчет статистики для дашборда
+        
+        Все счетчики считаются одним запросом: по каждой таблице строится
+        агрегирующий подзапрос с COUNT(*) FILTER (WHERE ...), а подзапросы
+        объединяются в один SELECT.
+        """
+        today = get_utc_today()
         month_start = today.replace(day=1)
         
-        stats = {
-            # Пользователи
-            'users_count': User.query.filter(User.is_active == True).count(),
-            'new_users_today': User.query.filter(
-                User.registration_date >= today,
-                User.is_active == True
-            ).count(),
-            'new_users_month': User.query.filter(
-                User.registration_date >= month_start,
-                User.is_active == True
-            ).count(),
-            
-            # Объявления
-            'listings_count': Listing.query.filter(Listing.is_active == True).count(),
-            'active_listings_count': Listing.query.filter(
-                Listing.is_active == True
-            ).count(),
-            'new_listings_today': Listing.query.filter(
-                Listing.created_date >= today,
-                Listing.is_active == True
-            ).count(),
-            
-            # Модерация
-            'pending_moderation_count': ModerationQueue.query.filter(
-                ModerationQueue.is_active == True
-            ).count(),
-            'pending_reports_count': ReportedContent.query.filter(
-                ReportedContent.is_active == True
-            ).count(),
-        }
+        # Пользователи
+        users_stats = db.session.query(
+            func.count(User.user_id).label('users_count'),
+            func.count(User.user_id).filter(User.registration_date >= today).label('new_users_today'),
+            func.count(User.user_id).filter(User.registration_date >= month_start).label('new_users_month')
+        ).filter(User.is_active == True).subquery()
+        
+        # Объявления
+        listings_stats = db.session.query(
+            func.count(Listing.listing_id).label('listings_count'),
+            func.count(Listing.listing_id).filter(Listing.created_date >= today).label('new_listings_today')
+        ).filter(Listing.is_active == True).subquery()
+        
+        # Модерация
+        pending_moderation = db.session.query(
+            func.count(ModerationQueue.moderation_id)
+        ).filter(ModerationQueue.is_active == True).scalar_subquery()
+        
+        pending_reports = db.session.query(
+            func.count(ReportedContent.report_id)
+        ).filter(ReportedContent.is_active == True).scalar_subquery()
+        
+        row = db.session.query(
+            users_stats.c.users_count,
+            users_stats.c.new_users_today,
+            users_stats.c.new_users_month,
+            listings_stats.c.listings_count,
+            listings_stats.c.new_listings_today,
+            pending_moderation.label('pending_moderation_count'),
+            pending_reports.label('pending_reports_count')
+        ).one()
+        
+        stats = row._asdict()
+        # Поле сохраняется для совместимости ответа API (AdminStatsSchema)
+        stats['active_listings_count'] = stats['listings_count']
         
         return stats
     
     @staticmethod
-    def get_moderation_queue(page=1, per_page=20, status=None, priority=None):
+    def _full_name(user):
+        """SQL аналог User.full_name; NULL, если пользователя нет (как в to_dict)"""
+        return case(
+            (user.user_id.isnot(None),
+             func.concat_ws(' ', func.nullif(user.first_name, ''), func.nullif(user.last_name, '')))
+        )
+    
+    @staticmethod
+    def get_moderation_queue(page=1, per_page=20, status=None, priority=None, after=None):
         """
         Получение очереди модерации
         
@@ -62,19 +181,60 @@ class AdminService:
             per_page: Элементов на странице
             status: Фильтр по статусу
             priority: Фильтр по приоритету
+            after: Курсор keyset пагинации; если передан (в том числе пустой
+                для первой страницы), page игнорируется
             
         Returns:
-            Очередь модерации с пагинацией
+            Очередь модерации с пагинацией (строки сериализуются
+            ModerationQueue.row_to_dict)
         """
-        query = ModerationQueue.query.filter(ModerationQueue.is_active == True)
+        submitter = aliased(User)
+        moderator = aliased(User)
+        
+        # Выбираем только нужные колонки: строки сериализуются через
+        # Row._asdict() без создания ORM объектов и ленивых загрузок связей
+        query = db.session.query(
+            ModerationQueue.moderation_id,
+            ModerationQueue.entity_id,
+            ModerationQueue.user_id,
+            AdminService._full_name(submitter).label('user_name'),
+            ModerationQueue.moderator_id,
+            AdminService._full_name(moderator).label('moderator_name'),
+            Status.status_name.label('status'),
+            ModerationQueue.priority,
+            ModerationQueue.rejection_reason,
+            ModerationQueue.submitted_date,
+            ModerationQueue.moderated_date,
+            ModerationQueue.notes,
+            ModerationQueue.auto_moderation_score
+        ).outerjoin(
+            submitter, submitter.user_id == ModerationQueue.user_id
+        ).outerjoin(
+            moderator, moderator.user_id == ModerationQueue.moderator_id
+        ).outerjoin(
+            Status, Status.status_id == ModerationQueue.status_id
+        ).filter(ModerationQueue.is_active == True)
         
         if status:
-            # Фильтр по статусу можно добавить когда будет готова таблица статусов
-            pass
+            query = query.filter(
+                ModerationQueue.status_id == AdminService._get_status_id('moderation_status', status)
+            )
         
         if priority is not None:
             query = query.filter(ModerationQueue.priority == priority)
         
+        if after is not None:
+            return KeysetPagination(
+                query,
+                order_by=[
+                    (ModerationQueue.priority, 'desc'),
+                    (ModerationQueue.submitted_date, 'asc'),
+                    (ModerationQueue.moderation_id, 'asc')
+                ],
+                after=after,
+                per_page=per_page
+            )
+        
         query = query.order_by(
             desc(ModerationQueue.priority),
             ModerationQueue.submitted_date
@@ -87,6 +247,10 @@ class AdminService:
         """
         Модерация контента
         
+        Права модератора проверяются условием EXISTS в самом UPDATE, поэтому
+        проверка и изменение выполняются одним запросом, и понижение роли
+        между ними не может пройти незамеченным.
+        
         Args:
             moderation_id: ID элемента модерации
             moderator_id: ID модератора
@@ -101,72 +265,141 @@ class AdminService:
             NotFoundError: Если элемент не найден
             AuthorizationError: Если нет прав
         """
-        moderation_item = ModerationQueue.query.get(moderation_id)
-        if not moderation_item:
-            raise NotFoundError("Moderation item not found")
+        moderator_allowed = db.session.query(User.user_id).filter(
+            User.user_id == moderator_id,
+            User.user_type.in_(['admin', 'moderator']),
+            User.is_active == True
+        ).exists()
+        
+        status_code = 'approved' if action == 'approve' else 'rejected'
+        values = {
+            'status_id': AdminService._get_status_id('moderation_status', status_code),
+            'moderator_id': moderator_id,
+            'moderated_date': datetime.utcnow(),
+            'notes': notes
+        }
+        if action == 'reject':
+            values['rejection_reason'] = reason
         
-        # Проверяем права модератора
-        moderator = User.query.get(moderator_id)
-        if not moderator or moderator.user_type not in ['admin', 'moderator']:
+        stmt = update(ModerationQueue).where(
+            ModerationQueue.moderation_id == moderation_id,
+            moderator_allowed
+        ).values(**values).returning(ModerationQueue)
+        
+        moderation_item = db.session.scalars(stmt).first()
+        
+        if moderation_item is None:
+            db.session.rollback()
+            if db.session.get(ModerationQueue, moderation_id) is None:
+                raise NotFoundError("Moderation item not found")
             raise AuthorizationError("Insufficient permissions")
         
         if action == 'approve':
-            moderation_item.approve(moderator_id, notes)
             # Активируем связанный контент
-            AdminService._activate_moderated_content(moderation_item.entity_id)
+            AdminService._apply_to_listing(moderation_item.entity_id, AdminService._publish_listing)
         
         elif action == 'reject':
-            moderation_item.reject(moderator_id, reason, notes)
             # Отклоняем связанный контент
-            AdminService._reject_moderated_content(moderation_item.entity_id, reason)
+            AdminService._apply_to_listing(moderation_item.entity_id, AdminService._deactivate_listing)
+        
+        db.session.commit()
         
         return moderation_item
     
     @staticmethod
-    def _activate_moderated_content(entity_id):
-        """Активация контента после одобрения"""
-        try:
-            from app.models.base import GlobalEntity
+    def moderate_content_bulk(moderation_ids, moderator_id, action, reason=None, notes=None, moderator=None):
+        """
+        Массовая модерация контента
+        
+        Элементы очереди загружаются одним запросом, связанные объявления
+        обновляются одним UPDATE, все изменения фиксируются одним COMMIT.
+        
+        Args:
+            moderation_ids: ID элементов модерации
+            moderator_id: ID модератора
+            action: Действие (approve/reject)
+            reason: Причина отклонения
+            notes: Заметки модератора
+            moderator: Уже загруженный модератор (например, g.current_user)
             
-            entity = GlobalEntity.query.get(entity_id)
-            if not entity:
-                return
+        Returns:
+            Список ID обработанных элементов модерации
             
-            if entity.entity_type == 'listing':
-                listing = Listing.query.filter_by(entity_id=entity_id).first()
-                if listing:
-                    # Можно добавить логику для активации через статусы
-                    listing.published_date = datetime.utcnow()
-                    listing.save()
-        except ImportError:
-            # Если модель GlobalEntity не существует, работаем напрямую с Listing
-            listing = Listing.query.get(entity_id)
-            if listing:
-                listing.published_date = datetime.utcnow()
-                listing.save()
+        Raises:
+            NotFoundError: Если элементы не найдены
+            AuthorizationError: Если нет прав
+        """
+        if moderator is None:
+            moderator = db.session.get(User, moderator_id)
+        if not moderator or moderator.user_type not in ['admin', 'moderator']:
+            raise AuthorizationError("Insufficient permissions")
+        
+        items = ModerationQueue.query.filter(
+            ModerationQueue.moderation_id.in_(moderation_ids),
+            ModerationQueue.is_active == True
+        ).all()
+        if not items:
+            raise NotFoundError("Moderation items not found")
+        
+        status_code = 'approved' if action == 'approve' else 'rejected'
+        status_id = AdminService._get_status_id('moderation_status', status_code)
+        now = datetime.utcnow()
+        
+        for item in items:
+            item.status_id = status_id
+            item.moderator_id = moderator_id
+            item.moderated_date = now
+            item.notes = notes
+            if action == 'reject':
+                item.rejection_reason = reason
+        
+        listings = Listing.query.filter(
+            Listing.entity_id.in_([item.entity_id for item in items])
+        )
+        if action == 'approve':
+            listings.update({'published_date': now}, synchronize_session=False)
+        else:
+            listings.update({'is_active': False}, synchronize_session=False)
+        
+        # ID собираются до commit, после которого объекты устаревают
+        moderation_ids = [item.moderation_id for item in items]
+        db.session.commit()
+        
+        return moderation_ids
     
     @staticmethod
-    def _reject_moderated_content(entity_id, reason):
-        """Отклонение контента"""
-        try:
-            from app.models.base import GlobalEntity
-            
-            entity = GlobalEntity.query.get(entity_id)
-            if not entity:
-                return
-            
-            if entity.entity_type == 'listing':
-                listing = Listing.query.filter_by(entity_id=entity_id).first()
-                if listing:
-                    listing.soft_delete()
-        except ImportError:
-            # Если модель GlobalEntity не существует, работаем напрямую с Listing
-            listing = Listing.query.get(entity_id)
-            if listing:
-                listing.soft_delete()
+    def _apply_to_listing(entity_id, action):
+        """
+        Применение действия к объявлению, связанному с глобальной сущностью
+        
+        Объявление находится одним запросом через GlobalEntity; если сущность
+        не является объявлением, действие не выполняется.
+        """
+        listing = Listing.query.join(
+            GlobalEntity, GlobalEntity.entity_id == Listing.entity_id
+        ).filter(
+            GlobalEntity.entity_id == entity_id,
+            GlobalEntity.entity_type == 'listing'
+        ).first()
+        
+        if listing:
+            action(listing)
+        
+        return listing
+    
+    @staticmethod
+    def _publish_listing(listing):
+        """Публикация объявления после одобрения (без commit)"""
+        # Можно добавить логику для активации через статусы
+        listing.published_date = datetime.utcnow()
     
     @staticmethod
-    def get_reports(page=1, per_page=20, status=None, reason=None):
+    def _deactivate_listing(listing):
+        """Снятие объявления (отклонение модерацией или подтвержденная жалоба, без commit)"""
+        listing.is_active = False
+    
+    @staticmethod
+    def get_reports(page=1, per_page=20, status=None, reason=None, after=None):
         """
         Получение жалоб
         
@@ -175,19 +408,37 @@ class AdminService:
             per_page: Элементов на странице
             status: Фильтр по статусу
             reason: Фильтр по причине
+            after: Курсор keyset пагинации (page игнорируется)
             
         Returns:
             Жалобы с пагинацией
         """
-        query = ReportedContent.query.filter(ReportedContent.is_active == True)
+        # Связи, используемые в to_dict(), загружаются в том же запросе
+        query = ReportedContent.query.options(
+            joinedload(ReportedContent.reporter),
+            joinedload(ReportedContent.resolver),
+            joinedload(ReportedContent.status)
+        ).filter(ReportedContent.is_active == True)
         
         if status:
-            # Фильтр по статусу можно добавить когда будет готова таблица статусов
-            pass
+            query = query.filter(
+                ReportedContent.status_id == AdminService._get_status_id('report_status', status)
+            )
         
         if reason:
             query = query.filter(ReportedContent.report_reason == reason)
         
+        if after is not None:
+            return KeysetPagination(
+                query,
+                order_by=[
+                    (ReportedContent.created_date, 'desc'),
+                    (ReportedContent.report_id, 'desc')
+                ],
+                after=after,
+                per_page=per_page
+            )
+        
         query = query.order_by(desc(ReportedContent.created_date))
         
         return paginate_query(query, page, per_page)
@@ -206,23 +457,29 @@ class AdminService:
         Returns:
             Созданная жалоба
         """
-        # Проверяем, не подавал ли пользователь уже жалобу на этот контент
-        existing = ReportedContent.query.filter(
-            ReportedContent.reporter_id == reporter_id,
-            ReportedContent.entity_id == entity_id,
-            ReportedContent.is_active == True
-        ).first()
-        
-        if existing:
-            return existing
-        
-        report = ReportedContent(
+        # Вставка и проверка дубликата выполняются атомарно одним запросом:
+        # при наличии активной жалобы от этого пользователя строка не создается
+        stmt = pg_insert(ReportedContent).values(
             reporter_id=reporter_id,
             entity_id=entity_id,
             report_reason=reason,
-            description=description
-        )
-        report.save()
+            description=description,
+            status_id=AdminService._get_status_id('report_status', 'pending')
+        ).on_conflict_do_nothing(
+            index_elements=['reporter_id', 'entity_id'],
+            index_where=ReportedContent.is_active == True
+        ).returning(ReportedContent)
+        
+        report = db.session.scalars(stmt).first()
+        
+        if report is None:
+            return ReportedContent.query.filter(
+                ReportedContent.reporter_id == reporter_id,
+                ReportedContent.entity_id == entity_id,
+                ReportedContent.is_active == True
+            ).first()
+        
+        db.session.commit()
         
         return report
     
@@ -240,16 +497,17 @@ class AdminService:
         Returns:
             Разрешенная жалоба
         """
-        report = ReportedContent.query.get(report_id)
+        report = db.session.get(ReportedContent, report_id)
         if not report:
             raise NotFoundError("Report not found")
         
-        report.resolve(resolver_id, notes)
-        
         if action == 'resolve':
             # Применяем действия к контенту
             AdminService._handle_confirmed_report(report)
         
+        # Изменения контента сохраняются одним commit с жалобой
+        report.resolve(resolver_id, notes)
+        
         return report
     
     @staticmethod
@@ -257,54 +515,41 @@ class AdminService:
         """Обработка подтвержденной жалобы"""
         if report.report_reason in ['spam', 'fraud', 'inappropriate']:
             # Деактивируем контент
-            AdminService._deactivate_reported_content(report.entity_id)
+            AdminService._apply_to_listing(report.entity_id, AdminService._deactivate_listing)
         
         elif report.report_reason == 'duplicate':
             # Отправляем на модерацию
             AdminService._send_to_moderation(report.entity_id, 'duplicate_check')
     
-    @staticmethod
-    def _deactivate_reported_content(entity_id):
-        """Деактивация контента по жалобе"""
-        try:
-            from app.models.base import GlobalEntity
-            
-            entity = GlobalEntity.query.get(entity_id)
-            if not entity:
-                return
-            
-            if entity.entity_type == 'listing':
-                listing = Listing.query.filter_by(entity_id=entity_id).first()
-                if listing:
-                    listing.soft_delete()
-        except ImportError:
-            listing = Listing.query.get(entity_id)
-            if listing:
-                listing.soft_delete()
-    
     @staticmethod
     def _send_to_moderation(entity_id, reason):
         """Отправка контента на модерацию"""
-        # Проверяем, нет ли уже в очереди
-        existing = ModerationQueue.query.filter(
-            ModerationQueue.entity_id == entity_id,
-            ModerationQueue.is_active == True
-        ).first()
-        
-        if existing:
-            return existing
-        
-        moderation_item = ModerationQueue(
+        # Проверка очереди и вставка выполняются одним запросом: уникальный
+        # частичный индекс не допускает второго активного элемента на сущность
+        stmt = pg_insert(ModerationQueue).values(
             entity_id=entity_id,
             user_id=1,  # Системный пользователь
+            status_id=AdminService._get_status_id('moderation_status', 'pending'),
             priority=1
-        )
-        moderation_item.save()
+        ).on_conflict_do_nothing(
+            index_elements=['entity_id'],
+            index_where=ModerationQueue.is_active == True
+        ).returning(ModerationQueue)
+        
+        moderation_item = db.session.scalars(stmt).first()
+        
+        if moderation_item is None:
+            return ModerationQueue.query.filter(
+                ModerationQueue.entity_id == entity_id,
+                ModerationQueue.is_active == True
+            ).first()
+        
+        db.session.commit()
         
         return moderation_item
     
     @staticmethod
-    def get_users(page=1, per_page=20, user_type=None, status=None, search=None):
+    def get_users(page=1, per_page=20, user_type=None, status=None, search=None, after=None):
         """
         Получение пользователей для администрирования
         
@@ -314,6 +559,7 @@ class AdminService:
             user_type: Фильтр по типу пользователя
             status: Фильтр по статусу
             search: Поисковый запрос
+            after: Курсор keyset пагинации (page игнорируется)
             
         Returns:
             Пользователи с пагинацией
@@ -328,22 +574,40 @@ class AdminService:
         elif status == 'blocked':
             query = query.filter(User.is_active == False)
         
+        rank = None
         if search:
-            query = query.filter(
-                or_(
-                    User.first_name.ilike(f'%{search}%'),
-                    User.last_name.ilike(f'%{search}%'),
-                    User.phone_number.ilike(f'%{search}%'),
-                    User.email.ilike(f'%{search}%')
-                )
+            # Одним запросом: совпадение по словам через tsvector (GIN индекс
+            # idx_users_search_vector) или по подстроке - части телефона или
+            # email - через триграммный индекс
+            ts_query = func.websearch_to_tsquery('simple', search)
+            query = query.filter(or_(
+                User.search_vector.op('@@')(ts_query),
+                User.search_text().ilike(f'%{search}%')
+            ))
+            rank = func.ts_rank(User.search_vector, ts_query)
+        
+        if after is not None:
+            # Keyset пагинация идет по дате регистрации: ранг не подходит для курсора
+            return KeysetPagination(
+                query,
+                order_by=[
+                    (User.registration_date, 'desc'),
+                    (User.user_id, 'desc')
+                ],
+                after=after,
+                per_page=per_page
             )
         
-        query = query.order_by(desc(User.registration_date))
+        if rank is not None:
+            # Совпадения по словам выше совпадений только по подстроке (ранг 0)
+            query = query.order_by(rank.desc(), desc(User.registration_date))
+        else:
+            query = query.order_by(desc(User.registration_date))
         
         return paginate_query(query, page, per_page)
     
     @staticmethod
-    def perform_user_action(user_id, admin_id, action, reason=None, duration_days=None):
+    def perform_user_action(user_id, admin_id, action, reason=None, duration_days=None, admin=None):
         """
         Выполнение действия с пользователем
         
@@ -353,29 +617,35 @@ class AdminService:
             action: Действие
             reason: Причина
             duration_days: Длительность (для временных блокировок)
+            admin: Уже загруженный администратор (например, g.current_user)
             
         Returns:
             Результат действия
         """
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             raise NotFoundError("User not found")
         
-        admin = User.query.get(admin_id)
+        if admin is None:
+            admin = db.session.get(User, admin_id)
         if not admin or admin.user_type != 'admin':
             raise AuthorizationError("Admin access required")
         
         if action == 'block':
-            user.soft_delete()
-            # Деактивируем все объявления пользователя
-            Listing.query.filter(Listing.user_id == user_id).update({
-                'is_active': False
-            })
+            user.is_active = False
+            # Каскад в той же транзакции: объявления заблокированного
+            # пользователя не остаются опубликованными
+            AdminService._deactivate_user_content(user_id)
+            user.save()
             
         elif action == 'unblock':
             user.is_active = True
             user.save()
             
+            # Вход заблокированного пользователя закэшировал промах по его идентификаторам
+            from app.blueprints.auth.services import AuthService
+            AuthService.forget_unknown_identifiers(user.phone_number, user.email)
+            
         elif action == 'promote':
             if user.user_type == 'regular':
                 user.user_type = 'pro'
@@ -390,11 +660,47 @@ class AdminService:
                 user.user_type = 'regular'
             user.save()
         
-        # Логируем действие
-        AdminService._log_admin_action(admin_id, user_id, action, reason)
+        User.invalidate_auth_state(user_id)
+        
+        # Журнал действия пишется фоновой задачей
+        AdminService._enqueue_admin_action_log(admin_id, user_id, action, reason)
         
         return {'action': action, 'user_id': user_id, 'success': True}
     
+    @staticmethod
+    def _deactivate_user_content(user_id):
+        """
+        Деактивация объявлений и элементов очереди модерации пользователя
+        
+        По одному UPDATE на таблицу без COMMIT: изменения сохраняются
+        вместе с блокировкой пользователя.
+        """
+        Listing.query.filter(
+            Listing.user_id == user_id,
+            Listing.is_active == True
+        ).update({'is_active': False}, synchronize_session=False)
+        
+        # Контент заблокированного пользователя снимается из очереди модерации
+        ModerationQueue.query.filter(
+            ModerationQueue.user_id == user_id,
+            ModerationQueue.is_active == True
+        ).update({'is_active': False}, synchronize_session=False)
+    
+    @staticmethod
+    def _enqueue_admin_action_log(admin_id, target_user_id, action, reason):
+        """Постановка записи журнала административного действия в очередь Celery"""
+        from flask import current_app
+        from app.tasks.admin import log_admin_action
+        
+        try:
+            # retry=False: при недоступном брокере сразу пишем журнал в запросе
+            log_admin_action.apply_async(
+                args=(admin_id, target_user_id, action, reason), retry=False
+            )
+        except Exception as e:
+            current_app.logger.warning(f"Celery unavailable, logging admin action inline: {e}")
+            AdminService._log_admin_action(admin_id, target_user_id, action, reason)
+    
     @staticmethod
     def _log_admin_action(admin_id, target_user_id, action, reason):
         """Логирование административных действий"""
@@ -402,24 +708,40 @@ class AdminService:
         pass
     
     @staticmethod
-    def get_system_health():
-        """Получение состояния системы"""
+    @cache.memoize(timeout=5)  # Частый опрос дашбордом не нагружает БД и Redis
+    def get_system_health(deep=False):
+        """
+        Получение состояния системы
+        
+        Args:
+            deep: Выполнить проверочный запрос к БД; по умолчанию достаточно
+                получить соединение из пула (pool_pre_ping проверяет его сам)
+        """
         try:
             # Проверка БД
-            db_status = db.session.execute('SELECT 1').fetchone() is not None
-        except:
+            if deep:
+                db_status = db.session.execute(_HEALTH_PROBE).scalar() == 1
+            else:
+                with db.engine.connect():
+                    db_status = True
+        except Exception:
             db_status = False
         
         try:
-            # Проверка Redis
-            from app.extensions import cache
-            cache.get('health_check')
-            redis_status = True
-        except:
+            # Проверка Redis: у Redis бэкенда есть клиент с ping(),
+            # для остальных бэкендов достаточно обращения к кэшу
+            client = getattr(cache.cache, '_write_client', None)
+            if client is not None:
+                redis_status = bool(client.ping())
+            else:
+                cache.get('health_check')
+                redis_status = True
+        except Exception:
             redis_status = False
         
         return {
             'database': db_status,
+            'database_pool': db.engine.pool.status(),
             'redis': redis_status,
             'timestamp': datetime.utcnow().isoformat()
-        }
\ No newline at end of file
+        }
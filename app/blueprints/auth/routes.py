@@ -7,6 +7,7 @@ from app.blueprints.auth.shemas import (
     VerifyEmailSchema, ResetPasswordSchema, ChangePasswordSchema, RefreshTokenSchema
 )
 from app.blueprints.auth.services import AuthService
+from app.models.user import User
 from app.utils.decorators import validate_json, handle_errors, auth_required, rate_limit_by_user, rate_limit_by_ip
 from app.utils.helpers import build_error_response
 
@@ -31,7 +32,6 @@ def register():
         'message': "User registered successfully. Please verify your phone number.",
         'status_code' : 201
     }
-    print(answer)
     return jsonify(answer), 201
 
 
@@ -42,7 +42,6 @@ def register():
 def login():
     """Вход пользователя"""
     data = g.validated_data
-    print(data)
     
     user, tokens = AuthService.authenticate_user(
         identifier=data['phone_number'],
@@ -50,10 +49,9 @@ def login():
     )
     
     response_data = {
-        'user': user.to_dict(),
+        'user': user.to_dict(fields=User.AUTH_DICT_FIELDS),
         'tokens': tokens
     }
-    print(response_data)
     
     return jsonify({
         'data' : response_data,
@@ -178,6 +176,6 @@ def change_password():
 def get_current_user():
     """Получение информации о текущем пользователе"""
     return jsonify(
-        data=g.current_user.to_dict(),
+        data=g.current_user.to_dict(fields=User.AUTH_DICT_FIELDS),
         message="User information retrieved successfully"
     )
\ No newline at end of file
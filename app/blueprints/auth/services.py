@@ -1,9 +1,15 @@
 # app/blueprints/auth/services.py
+import hashlib
+import os
 import secrets
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from flask import current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, get_jwt
-from app.extensions import db
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from werkzeug.security import generate_password_hash
+from app.extensions import db, cache
 from app.models.user import (
     User, PhoneVerification, EmailVerification, LoginAttempt, RevokedToken
 )
@@ -12,7 +18,35 @@ from app.utils.exceptions import (
     PhoneAlreadyExistsError, EmailAlreadyExistsError, 
     InvalidCredentialsError, VerificationCodeError, UserNotFoundError
 )
-from app.utils.helpers import normalize_phone_number, validate_email_address, get_client_ip, get_user_agent
+from app.utils.helpers import (
+    normalize_phone_number, try_normalize_phone, validate_email_address, get_client_ip, get_user_agent
+)
+
+
+# Буфер заранее сгенерированных 6-значных кодов верификации
+_CODE_BATCH_SIZE = 512
+_CODE_RANGE = 900000
+# Верхняя граница для 3 байт, кратная диапазону (без смещения по модулю)
+_CODE_LIMIT = (2 ** 24 // _CODE_RANGE) * _CODE_RANGE
+_code_buffer = deque()
+_code_buffer_lock = threading.Lock()
+
+
+def _next_verification_code():
+    """Следующий код из буфера; буфер пополняется одним вызовом os.urandom"""
+    with _code_buffer_lock:
+        if not _code_buffer:
+            random_bytes = os.urandom(3 * _CODE_BATCH_SIZE)
+            for offset in range(0, len(random_bytes), 3):
+                value = int.from_bytes(random_bytes[offset:offset + 3], 'big')
+                # Отбрасываем значения из неполного хвоста диапазона
+                if value < _CODE_LIMIT:
+                    _code_buffer.append(value % _CODE_RANGE + 100000)
+        
+        if _code_buffer:
+            return _code_buffer.popleft()
+    
+    return secrets.randbelow(_CODE_RANGE) + 100000
 
 
 class AuthService:
@@ -39,28 +73,32 @@ class AuthService:
         """
         # Нормализуем номер телефона
         normalized_phone = normalize_phone_number(phone_number)
+        normalized_email = validate_email_address(email) if email else None
         
-        # Проверяем существование пользователя с таким телефоном
-        existing_user = User.find_by_phone(normalized_phone)
-        if existing_user:
-            raise PhoneAlreadyExistsError(normalized_phone)
-        
-        # Проверяем email если указан
-        if email:
-            normalized_email = validate_email_address(email)
-            existing_email_user = User.find_by_email(normalized_email)
-            if existing_email_user:
-                raise EmailAlreadyExistsError(normalized_email)
-        
-        # Создаем пользователя
-        user = User(
+        # Вставка одним запросом: конфликт по телефону или email (уникальные
+        # индексы users) не создает строку, и RETURNING ничего не возвращает
+        stmt = pg_insert(User).values(
             phone_number=normalized_phone,
             email=email,
             first_name=first_name,
-            last_name=last_name
-        )
-        user.set_password(password)
-        user.save()
+            last_name=last_name,
+            password_hash=generate_password_hash(password)
+        ).on_conflict_do_nothing().returning(User)
+        
+        user = db.session.scalars(stmt).first()
+        
+        if user is None:
+            db.session.rollback()
+            # Уточняем, какое поле вызвало конфликт
+            phone_taken = db.session.query(User.user_id).filter(
+                User.phone_number == normalized_phone
+            ).first()
+            if phone_taken or not normalized_email:
+                raise PhoneAlreadyExistsError(normalized_phone)
+            raise EmailAlreadyExistsError(normalized_email)
+        
+        db.session.commit()
+        AuthService.forget_unknown_identifiers(normalized_phone, normalized_email)
         
         # Отправляем код верификации телефона
         AuthService.send_phone_verification(normalized_phone)
@@ -86,31 +124,22 @@ class AuthService:
         Raises:
             InvalidCredentialsError: Если учетные данные неверны
         """
-        print('№!')
         ip_address = get_client_ip()
         user_agent = get_user_agent()
-        print('#2')
-        # Проверяем лимит попыток входа
+        
+        # Проверяем лимит неудачных попыток входа (счетчик в кэше)
         if not LoginAttempt.check_rate_limit(ip_address):
             from app.utils.exceptions import RateLimitError
             raise RateLimitError("Too many login attempts. Try again later.")
-        print('#3')
+        
         # Ищем пользователя по телефону или email
-        user = None
-        if '@' in identifier:
-            user = User.find_by_email(identifier)
-        else:
-            try:
-                normalized_phone = normalize_phone_number(identifier)
-                user = User.find_by_phone(normalized_phone)
-            except ValueError:
-                print('Ошибка здесь')
-                pass
+        user = AuthService._find_user_by_identifier(identifier)
         
         # Проверяем пароль
         if not user or not user.check_password(password):
-            # Логируем неудачную попытку
-            LoginAttempt.log_attempt(
+            # Учитываем и логируем неудачную попытку
+            LoginAttempt.register_failure(ip_address)
+            AuthService._log_login_attempt(
                 identifier=identifier,
                 ip_address=ip_address,
                 success=False,
@@ -118,27 +147,87 @@ class AuthService:
                 failure_reason="Invalid credentials"
             )
             raise InvalidCredentialsError()
-        print('#4')
+        
         # Логируем успешную попытку
-        LoginAttempt.log_attempt(
+        AuthService._log_login_attempt(
             identifier=identifier,
             ip_address=ip_address,
             success=True,
             user_agent=user_agent
         )
-        print('#5')
+        
         # Обновляем время последнего входа
         user.update_last_login()
-        print('#6')
+        
         # Генерируем токены
         tokens = user.generate_tokens()
         return user, tokens
     
+    # Сколько помнить, что идентификатор не принадлежит активному пользователю
+    UNKNOWN_IDENTIFIER_TIMEOUT = 60
+    
+    @staticmethod
+    def _unknown_identifier_key(identifier):
+        """Ключ кэша промахов для нормализованного телефона или email"""
+        digest = hashlib.blake2b(identifier.encode(), digest_size=16).hexdigest()
+        return f"auth:unknown:{digest}"
+    
+    @staticmethod
+    def forget_unknown_identifiers(*identifiers):
+        """Сброс кэша промахов (после регистрации, смены email или разблокировки)"""
+        keys = [
+            AuthService._unknown_identifier_key(identifier.lower())
+            for identifier in identifiers if identifier
+        ]
+        if keys:
+            cache.delete_many(*keys)
+    
+    @staticmethod
+    def _find_user_by_identifier(identifier):
+        """
+        Поиск пользователя по email или телефону без обработки исключений
+        
+        Промахи кэшируются ненадолго, чтобы перебор несуществующих
+        идентификаторов не доходил до базы данных.
+        """
+        if '@' in identifier:
+            lookup, finder = identifier.lower(), User.find_by_email
+        else:
+            lookup, finder = try_normalize_phone(identifier), User.find_by_phone
+            if not lookup:
+                return None
+        
+        key = AuthService._unknown_identifier_key(lookup)
+        if cache.get(key):
+            return None
+        
+        user = finder(lookup)
+        if user is None:
+            cache.set(key, True, timeout=AuthService.UNKNOWN_IDENTIFIER_TIMEOUT)
+        
+        return user
+    
+    @staticmethod
+    def _log_login_attempt(**attempt):
+        """Запись попытки входа в журнал фоновой задачей"""
+        from app.tasks.auth import log_login_attempt
+        
+        try:
+            # retry=False: при недоступном брокере сразу переходим к записи в запросе
+            log_login_attempt.apply_async(kwargs=attempt, retry=False)
+        except Exception as e:
+            # Брокер недоступен: пишем в журнал синхронно
+            current_app.logger.warning(f"Celery unavailable, logging login attempt inline: {e}")
+            LoginAttempt.log_attempt(**attempt)
+    
     @staticmethod
     def send_phone_verification(phone_number):
         """
         Отправка кода верификации на телефон
         
+        Запись кода и отправка SMS выполняются фоновой задачей; в режиме
+        тестирования - синхронно, чтобы вернуть код.
+        
         Args:
             phone_number: Номер телефона
             
@@ -148,24 +237,43 @@ class AuthService:
         normalized_phone = normalize_phone_number(phone_number)
         ip_address = get_client_ip()
         
+        if current_app.config.get('TESTING'):
+            return AuthService.deliver_phone_verification(normalized_phone, ip_address)
+        
+        from app.tasks.auth import send_phone_verification_task
+        
+        try:
+            # retry=False: при недоступном брокере регистрация не ждет повторов публикации
+            send_phone_verification_task.apply_async(args=(normalized_phone, ip_address), retry=False)
+        except Exception as e:
+            # Брокер недоступен: отправляем синхронно
+            current_app.logger.warning(f"Celery unavailable, sending phone verification inline: {e}")
+            AuthService.deliver_phone_verification(normalized_phone, ip_address)
+        
+        return True
+    
+    @staticmethod
+    def deliver_phone_verification(normalized_phone, ip_address=None):
+        """
+        Создание кода верификации и отправка SMS
+        
+        Returns:
+            Код верификации
+        """
         # Генерируем код
-        verification_code = secrets.randbelow(900000) + 100000  # 6-значный код
+        verification_code = _next_verification_code()  # 6-значный код
         
         # Создаем запись верификации
-        verification = PhoneVerification.create_verification(
+        PhoneVerification.create_verification(
             phone_number=normalized_phone,
             code=str(verification_code),
             ip_address=ip_address
         )
         
-        # В продакшене здесь должна быть отправка SMS
-        if current_app.config.get('TESTING'):
-            return verification_code
-        
         # TODO: Интеграция с SMS провайдером
         # sms_service.send_sms(normalized_phone, f"Ваш код: {verification_code}")
         
-        return True
+        return verification_code
     
     @staticmethod
     def verify_phone_number(phone_number, verification_code):
@@ -209,24 +317,42 @@ class AuthService:
         """
         normalized_email = validate_email_address(email)
         
+        if current_app.config.get('TESTING'):
+            return AuthService.deliver_email_verification(user_id, normalized_email)
+        
+        from app.tasks.auth import send_email_verification_task
+        
+        try:
+            send_email_verification_task.apply_async(args=(user_id, normalized_email), retry=False)
+        except Exception as e:
+            # Брокер недоступен: отправляем синхронно
+            current_app.logger.warning(f"Celery unavailable, sending email verification inline: {e}")
+            AuthService.deliver_email_verification(user_id, normalized_email)
+        
+        return True
+    
+    @staticmethod
+    def deliver_email_verification(user_id, normalized_email):
+        """
+        Создание токена верификации и отправка письма
+        
+        Returns:
+            Токен верификации
+        """
         # Генерируем токен
         token = secrets.token_urlsafe(32)
         
         # Создаем запись верификации
-        verification = EmailVerification.create_verification(
+        EmailVerification.create_verification(
             user_id=user_id,
             email=normalized_email,
             token=token
         )
         
-        # В продакшене здесь должна быть отправка email
-        if current_app.config.get('TESTING'):
-            return token
-        
         # TODO: Отправка email
         # email_service.send_verification_email(normalized_email, token)
         
-        return True
+        return token
     
     @staticmethod
     def verify_email(token):
@@ -263,27 +389,26 @@ class AuthService:
             AuthenticationError: Если refresh токен невалиден
         """
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
-            
-            if not user or not user.is_active:
-                raise AuthenticationError("User not found or inactive")
-            
-            # Генерируем новый access токен
-            additional_claims = {
-                'user_type': user.user_type,
-                'is_verified': user.is_verified
-            }
-            
-            access_token = create_access_token(
-                identity=str(user_id),
-                additional_claims=additional_claims
-            )
-            
-            return access_token
-            
-        except Exception:
+            user_id = int(get_jwt_identity())
+        except (TypeError, ValueError):
             raise AuthenticationError("Invalid refresh token")
+        
+        # Для нового токена достаточно кэшированного состояния пользователя
+        state = User.get_auth_state(user_id)
+        
+        if not state['is_active']:
+            raise AuthenticationError("User not found or inactive")
+        
+        # Генерируем новый access токен
+        additional_claims = {
+            'user_type': state['user_type'],
+            'is_verified': state['is_verified']
+        }
+        
+        return create_access_token(
+            identity=str(user_id),
+            additional_claims=additional_claims
+        )
     
     @staticmethod
     def logout_user():
@@ -294,11 +419,11 @@ class AuthService:
             True если успешно
         """
         try:
-            jti = get_jwt()['jti']
+            claims = get_jwt()
             user_id = get_jwt_identity()
             
             # Добавляем токен в черный список
-            RevokedToken.revoke_token(jti, user_id)
+            RevokedToken.revoke_token(claims['jti'], user_id, expires_at=claims.get('exp'))
             
             return True
             
@@ -316,17 +441,8 @@ class AuthService:
         Returns:
             True если запрос отправлен
         """
-        user = None
-        
         # Ищем пользователя
-        if '@' in identifier:
-            user = User.find_by_email(identifier)
-        else:
-            try:
-                normalized_phone = normalize_phone_number(identifier)
-                user = User.find_by_phone(normalized_phone)
-            except ValueError:
-                pass
+        user = AuthService._find_user_by_identifier(identifier)
         
         if not user:
             # Не раскрываем информацию о существовании пользователя
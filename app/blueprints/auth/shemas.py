@@ -1,7 +1,22 @@
 # app/blueprints/auth/schemas.py
+import re
 from marshmallow import Schema, fields, validate, validates, ValidationError, validates_schema
 from app.utils.helpers import normalize_phone_number, validate_email_address
 
+# Грубая проверка формата до разбора номера библиотекой phonenumbers
+PHONE_RE = re.compile(r'^\+?[\d\s\-()]{10,20}$')
+
+
+def _check_phone_number(value):
+    """Проверка номера телефона: сначала регулярным выражением, затем phonenumbers"""
+    if not PHONE_RE.match(value):
+        raise ValidationError("Invalid phone number format")
+    
+    try:
+        normalize_phone_number(value)
+    except ValueError as e:
+        raise ValidationError(str(e))
+
 
 class RegisterSchema(Schema):
     """Схема для регистрации пользователя"""
@@ -13,10 +28,7 @@ class RegisterSchema(Schema):
     
     @validates('phone_number')
     def validate_phone_number(self, value):
-        try:
-            normalize_phone_number(value)
-        except ValueError as e:
-            raise ValidationError(str(e))
+        _check_phone_number(value)
     
     @validates('email')
     def validate_email(self, value):
@@ -34,10 +46,7 @@ class LoginSchema(Schema):
     remember_me = fields.Bool(required=False, default=False)
     @validates('phone_number')
     def validate_phone_number(self, value):
-        try:
-            normalize_phone_number(value)
-        except ValueError as e:
-            raise ValidationError(str(e))
+        _check_phone_number(value)
 
 class VerifyPhoneSchema(Schema):
     """Схема для верификации телефона"""
@@ -46,10 +55,7 @@ class VerifyPhoneSchema(Schema):
     
     @validates('phone_number')
     def validate_phone_number(self, value):
-        try:
-            normalize_phone_number(value)
-        except ValueError as e:
-            raise ValidationError(str(e))
+        _check_phone_number(value)
 
 
 class SendVerificationCodeSchema(Schema):
@@ -58,10 +64,7 @@ class SendVerificationCodeSchema(Schema):
     
     @validates('phone_number')
     def validate_phone_number(self, value):
-        try:
-            normalize_phone_number(value)
-        except ValueError as e:
-            raise ValidationError(str(e))
+        _check_phone_number(value)
 
 
 class VerifyEmailSchema(Schema):
@@ -3,11 +3,10 @@ from flask import request, jsonify
 from app.blueprints.cars import bp
 from app.blueprints.cars.services import CarService
 from app.blueprints.cars.schemas import (
-    BrandSchema, ModelSchema, GenerationSchema, BodyTypeSchema,
-    EngineTypeSchema, TransmissionTypeSchema, DriveTypeSchema,
-    ColorSchema, FeatureSchema, AttributeGroupSchema
+    brand_schema, brands_schema, model_schema, models_schema, generations_schema,
+    features_schema
 )
-from app.utils.decorators import handle_errors, cache_response
+from app.utils.decorators import handle_errors, cache_response, http_cache
 
 
 
@@ -24,13 +23,12 @@ def get_brands():
     if popular:
         # Получаем популярные марки
         brands_data = CarService.get_popular_brands(limit or 20)
-        schema = BrandSchema(many=True)
-        brands = [item['brand'] for item in brands_data]
-        result = schema.dump(brands)
-        
-        # Добавляем количество объявлений
-        for i, item in enumerate(brands_data):
-            result[i]['listings_count'] = item['listings_count']
+        schema = brand_schema
+        # Сериализация и количество объявлений за один проход
+        result = [
+            {**schema.dump(item['brand']), 'listings_count': item['listings_count']}
+            for item in brands_data
+        ]
     
     elif include_models:
         # Получаем марки с моделями
@@ -40,7 +38,7 @@ def get_brands():
     else:
         # Обычный запрос марок
         brands = CarService.get_brands(search, limit)
-        schema = BrandSchema(many=True)
+        schema = brands_schema
         result = schema.dump(brands)
     
     return jsonify(
@@ -55,7 +53,7 @@ def get_brands():
 def get_brand(brand_id):
     """Получение марки по ID"""
     brand = CarService.get_brand(brand_id)
-    schema = BrandSchema()
+    schema = brand_schema
     
     return jsonify(
         data=schema.dump(brand),
@@ -74,18 +72,17 @@ def get_models_by_brand(brand_id):
     if popular:
         # Получаем популярные модели
         models_data = CarService.get_popular_models_by_brand(brand_id, 20)
-        schema = ModelSchema(many=True)
-        models = [item['model'] for item in models_data]
-        result = schema.dump(models)
-        
-        # Добавляем количество объявлений
-        for i, item in enumerate(models_data):
-            result[i]['listings_count'] = item['listings_count']
+        schema = model_schema
+        # Сериализация и количество объявлений за один проход
+        result = [
+            {**schema.dump(item['model']), 'listings_count': item['listings_count']}
+            for item in models_data
+        ]
     
     else:
         # Обычный запрос моделей
         models = CarService.get_models_by_brand(brand_id, search)
-        schema = ModelSchema(many=True)
+        schema = models_schema
         result = schema.dump(models)
     
     return jsonify(
@@ -100,7 +97,7 @@ def get_models_by_brand(brand_id):
 def get_model(model_id):
     """Получение модели по ID"""
     model = CarService.get_model(model_id)
-    schema = ModelSchema()
+    schema = model_schema
     
     return jsonify(
         data=schema.dump(model),
@@ -114,7 +111,7 @@ def get_model(model_id):
 def get_generations_by_model(model_id):
     """Получение поколений по модели"""
     generations = CarService.get_generations_by_model(model_id)
-    schema = GenerationSchema(many=True)
+    schema = generations_schema
     
     return jsonify(
         data=schema.dump(generations),
@@ -124,70 +121,70 @@ def get_generations_by_model(model_id):
 
 @bp.route('/body-types', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_body_types():
     """Получение типов кузова"""
     body_types = CarService.get_body_types()
-    schema = BodyTypeSchema(many=True)
     
     return jsonify(
-        data=schema.dump(body_types),
+        data=body_types,
         message="Body types retrieved successfully"
     )
 
 
 @bp.route('/engine-types', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_engine_types():
     """Получение типов двигателей"""
     engine_types = CarService.get_engine_types()
-    schema = EngineTypeSchema(many=True)
     
     return jsonify(
-        data=schema.dump(engine_types),
+        data=engine_types,
         message="Engine types retrieved successfully"
     )
 
 
 @bp.route('/transmission-types', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_transmission_types():
     """Получение типов трансмиссий"""
     transmission_types = CarService.get_transmission_types()
-    schema = TransmissionTypeSchema(many=True)
     
     return jsonify(
-        data=schema.dump(transmission_types),
+        data=transmission_types,
         message="Transmission types retrieved successfully"
     )
 
 
 @bp.route('/drive-types', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_drive_types():
     """Получение типов приводов"""
     drive_types = CarService.get_drive_types()
-    schema = DriveTypeSchema(many=True)
     
     return jsonify(
-        data=schema.dump(drive_types),
+        data=drive_types,
         message="Drive types retrieved successfully"
     )
 
 
 @bp.route('/colors', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_colors():
     """Получение цветов"""
     colors = CarService.get_colors()
-    schema = ColorSchema(many=True)
     
     return jsonify(
-        data=schema.dump(colors),
+        data=colors,
         message="Colors retrieved successfully"
     )
 
@@ -201,7 +198,7 @@ def get_features():
     search = request.args.get('search')
     
     features = CarService.get_features(category_id, search)
-    schema = FeatureSchema(many=True)
+    schema = features_schema
     
     return jsonify(
         data=schema.dump(features),
@@ -256,6 +253,7 @@ def get_hierarchy():
 
 @bp.route('/reference-data', methods=['GET'])
 @handle_errors
+@http_cache(max_age=3600)
 @cache_response(timeout=3600)
 def get_reference_data():
     """Получение всех справочных данных"""
@@ -109,4 +109,13 @@ class AttributeSchema(Schema):
     is_searchable = fields.Bool(required=False, default=False)
     is_filterable = fields.Bool(required=False, default=False)
     validation_rules = fields.Raw(required=False)
-    default_value = fields.Str(required=False, allow_none=True)
\ No newline at end of file
+    default_value = fields.Str(required=False, allow_none=True)
+
+
+# Экземпляры схем создаются один раз при импорте модуля
+brand_schema = BrandSchema()
+brands_schema = BrandSchema(many=True)
+model_schema = ModelSchema()
+models_schema = ModelSchema(many=True)
+generations_schema = GenerationSchema(many=True)
+features_schema = FeatureSchema(many=True)
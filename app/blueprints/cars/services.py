@@ -1,5 +1,9 @@
 # app/blueprints/cars/services.py
-from sqlalchemy import func
+import threading
+import time
+from functools import wraps
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from app.models.car import (
     CarBrand, CarModel, CarGeneration, CarBodyType, CarEngineType,
     CarTransmissionType, CarDriveType, CarColor, CarFeature, CarAttributeGroup, CarAttribute,
@@ -8,10 +12,64 @@ from app.models.car import (
 )
 from app.utils.exceptions import NotFoundError
 from app.utils.pagination import paginate_query
+from app.utils.decorators import singleflight_cache
 from app.extensions import cache
 from app.database import db
 
 
+def _reference_rows(model, *columns):
+    """
+    Активные записи справочника в виде словарей (без ORM объектов и схем)
+    
+    Ключи совпадают с полями схем, порядок - по sort_order.
+    """
+    query = select(*columns).where(model.is_active == True).order_by(model.sort_order)
+    return [dict(row) for row in db.session.execute(query).mappings()]
+
+
+# Неизменяемые справочники хранятся в памяти процесса готовыми структурами:
+# без обращения к кэшу и десериализации на каждый запрос. Изменения
+# справочников не сбрасывают кэши, а становятся видны по истечении TTL:
+# до 5 минут в памяти процесса, затем до часа в cache_response маршрутов
+# /cars и еще до часа у клиентов по Cache-Control (http_cache).
+REFERENCE_CACHE_TTL = 300
+
+_reference_cache = {}
+_reference_lock = threading.Lock()
+
+
+def _reference_cached(f):
+    """
+    Кэширование результата функции без аргументов в памяти процесса
+    
+    При промахе справочник загружает один поток, остальные ждут его результат.
+    Устаревшее значение обновляет один поток, остальные сразу получают
+    прежнее значение и не ждут запроса к базе.
+    """
+    @wraps(f)
+    def decorated_function():
+        entry = _reference_cache.get(f.__name__)
+        
+        if entry is None or entry[0] <= time.monotonic():
+            # Ждем загрузки только если отдать пока нечего
+            if not _reference_lock.acquire(blocking=entry is None):
+                return entry[1]
+            
+            try:
+                entry = _reference_cache.get(f.__name__)
+                now = time.monotonic()
+                
+                if entry is None or entry[0] <= now:
+                    entry = (now + REFERENCE_CACHE_TTL, f())
+                    _reference_cache[f.__name__] = entry
+            finally:
+                _reference_lock.release()
+        
+        return entry[1]
+    
+    return decorated_function
+
+
 class CarService:
     """Сервис для работы с автомобильными справочниками"""
     
@@ -79,12 +137,14 @@ class CarService:
         Returns:
             Список моделей
         """
-        # Проверяем существование марки
-        CarService.get_brand(brand_id)
-        
-        query = CarModel.query.filter(
+        # Активность марки проверяется в том же запросе: модели неактивной
+        # марки не возвращаются
+        query = CarModel.query.join(
+            CarBrand, CarBrand.brand_id == CarModel.brand_id
+        ).filter(
             CarModel.brand_id == brand_id,
-            CarModel.is_active == True
+            CarModel.is_active == True,
+            CarBrand.is_active == True
         )
         
         if search:
@@ -92,7 +152,19 @@ class CarService:
                 CarModel.model_name.ilike(f'%{search}%')
             )
         
-        return query.order_by(CarModel.model_name).all()
+        models = query.order_by(CarModel.model_name).all()
+        
+        # Существование марки проверяется только при пустом результате
+        if not models:
+            brand_exists = db.session.query(CarBrand.brand_id).filter(
+                CarBrand.brand_id == brand_id,
+                CarBrand.is_active == True
+            ).scalar()
+            
+            if brand_exists is None:
+                raise NotFoundError(f"Brand {brand_id} not found", "brand")
+        
+        return models
     
     @staticmethod
     def get_model(model_id):
@@ -136,34 +208,61 @@ class CarService:
         return CarGeneration.get_by_model(model_id)
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_body_types():
         """Получение всех типов кузова"""
-        return CarBodyType.get_all_active()
+        return _reference_rows(
+            CarBodyType,
+            CarBodyType.body_type_id,
+            CarBodyType.body_type_name,
+            CarBodyType.icon_url,
+            CarBodyType.sort_order
+        )
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_engine_types():
         """Получение всех типов двигателей"""
-        return CarEngineType.get_all_active()
+        return _reference_rows(
+            CarEngineType,
+            CarEngineType.engine_type_id,
+            CarEngineType.engine_type_name,
+            CarEngineType.sort_order
+        )
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_transmission_types():
         """Получение всех типов трансмиссий"""
-        return CarTransmissionType.get_all_active()
+        return _reference_rows(
+            CarTransmissionType,
+            CarTransmissionType.transmission_id,
+            CarTransmissionType.transmission_name,
+            CarTransmissionType.sort_order
+        )
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_drive_types():
         """Получение всех типов приводов"""
-        return CarDriveType.get_all_active()
+        return _reference_rows(
+            CarDriveType,
+            CarDriveType.drive_type_id,
+            CarDriveType.drive_type_name,
+            CarDriveType.sort_order
+        )
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_colors():
         """Получение всех цветов"""
-        return CarColor.get_all_active()
+        return _reference_rows(
+            CarColor,
+            CarColor.color_id,
+            CarColor.color_name,
+            CarColor.color_hex,
+            CarColor.sort_order
+        )
     
     @staticmethod
     @cache.memoize(timeout=3600)
@@ -209,13 +308,13 @@ class CarService:
         return CarAttribute.get_filterable_attributes()
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @singleflight_cache(timeout=3600)
     def get_brands_with_models():
         """Получение марок с моделями"""
         return get_car_brands_with_models()
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @singleflight_cache(timeout=3600)
     def get_car_hierarchy(brand_id=None, model_id=None):
         """
         Получение иерархии марка -> модель -> поколение
@@ -230,18 +329,19 @@ class CarService:
         return get_car_hierarchy(brand_id, model_id)
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_reference_data():
         """Получение всех справочных данных"""
         return get_car_reference_data()
     
     @staticmethod
-    @cache.memoize(timeout=3600)
+    @_reference_cached
     def get_years_range():
         """Получение диапазона доступных годов"""
         return get_years_range()
     
     @staticmethod
+    @cache.memoize(timeout=600)
     def get_popular_brands(limit=20):
         """
         Получение популярных марок (по количеству объявлений)
@@ -252,29 +352,19 @@ class CarService:
         Returns:
             Список популярных марок
         """
-        from app.models.listing import ListingDetails
-        
-        # Запрос для получения марок с количеством объявлений
-        subquery = db.session.query(
-            func.cast(ListingDetails.searchable_fields['brand_id'], db.Integer).label('brand_id'),
-            func.count().label('listings_count')
-        ).group_by(
-            func.cast(ListingDetails.searchable_fields['brand_id'], db.Integer)
-        ).subquery()
-        
-        brands = db.session.query(CarBrand, subquery.c.listings_count).join(
-            subquery,
-            CarBrand.brand_id == subquery.c.brand_id
-        ).filter(
-            CarBrand.is_active == True
+        # Счетчик объявлений денормализован в car_brands.listings_count
+        brands = CarBrand.query.filter(
+            CarBrand.is_active == True,
+            CarBrand.listings_count > 0
         ).order_by(
-            subquery.c.listings_count.desc(),
+            CarBrand.listings_count.desc(),
             CarBrand.sort_order
         ).limit(limit).all()
         
-        return [{'brand': brand, 'listings_count': count} for brand, count in brands]
+        return [{'brand': brand, 'listings_count': brand.listings_count} for brand in brands]
     
     @staticmethod
+    @cache.memoize(timeout=600)
     def get_popular_models_by_brand(brand_id, limit=20):
         """
         Получение популярных моделей марки
@@ -286,32 +376,20 @@ class CarService:
         Returns:
             Список популярных моделей
         """
-        from app.models.listing import ListingDetails
-        
         # Проверяем существование марки
         CarService.get_brand(brand_id)
         
-        subquery = db.session.query(
-            func.cast(ListingDetails.searchable_fields['model_id'], db.Integer).label('model_id'),
-            func.count().label('listings_count')
-        ).filter(
-            func.cast(ListingDetails.searchable_fields['brand_id'], db.Integer) == brand_id
-        ).group_by(
-            func.cast(ListingDetails.searchable_fields['model_id'], db.Integer)
-        ).subquery()
-        
-        models = db.session.query(CarModel, subquery.c.listings_count).join(
-            subquery,
-            CarModel.model_id == subquery.c.model_id
-        ).filter(
+        # Счетчик объявлений денормализован в car_models.listings_count
+        models = CarModel.query.options(joinedload(CarModel.brand)).filter(
             CarModel.brand_id == brand_id,
-            CarModel.is_active == True
+            CarModel.is_active == True,
+            CarModel.listings_count > 0
         ).order_by(
-            subquery.c.listings_count.desc(),
+            CarModel.listings_count.desc(),
             CarModel.model_name
         ).limit(limit).all()
         
-        return [{'model': model, 'listings_count': count} for model, count in models]
+        return [{'model': model, 'listings_count': model.listings_count} for model in models]
     
     @staticmethod
     def search_brands_and_models(query_text, limit=10):
@@ -325,25 +403,46 @@ class CarService:
         Returns:
             Результаты поиска
         """
+        # Поиск регистронезависимый: "Toyota" и "toyota" делят одну запись кэша
+        return CarService._search_brands_and_models(query_text.strip().lower(), limit)
+    
+    @staticmethod
+    @cache.memoize(timeout=120)
+    def _search_brands_and_models(query_text, limit):
+        """Поиск по маркам и моделям для нормализованного запроса"""
         results = {
             'brands': [],
             'models': []
         }
         
-        # Поиск марок
-        brands = CarBrand.query.filter(
+        # Поиск марок (idx_car_brands_name_trgm); сначала наиболее похожие
+        brands = CarBrand.query.options(
+            selectinload(CarBrand.models)  # models_count в to_dict()
+        ).filter(
             CarBrand.brand_name.ilike(f'%{query_text}%'),
             CarBrand.is_active == True
-        ).order_by(CarBrand.sort_order).limit(limit).all()
+        ).order_by(
+            func.similarity(CarBrand.brand_name, query_text).desc(),
+            CarBrand.sort_order
+        ).limit(limit).all()
         
         results['brands'] = [brand.to_dict() for brand in brands]
         
-        # Поиск моделей
-        models = CarModel.query.join(CarBrand).filter(
+        # Поиск моделей (idx_car_models_name_trgm); сначала наиболее похожие
+        # Марка берется из уже присоединенной таблицы, остальные связи to_dict()
+        # загружаются пакетно
+        models = CarModel.query.join(CarBrand).options(
+            contains_eager(CarModel.brand),
+            joinedload(CarModel.body_type),
+            selectinload(CarModel.generations)
+        ).filter(
             CarModel.model_name.ilike(f'%{query_text}%'),
             CarModel.is_active == True,
             CarBrand.is_active == True
-        ).order_by(CarModel.model_name).limit(limit).all()
+        ).order_by(
+            func.similarity(CarModel.model_name, query_text).desc(),
+            CarModel.model_name
+        ).limit(limit).all()
         
         results['models'] = [model.to_dict() for model in models]
         
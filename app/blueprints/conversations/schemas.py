@@ -59,3 +59,6 @@ class MessageSchema(Schema):
     meta_data = fields.Raw(dump_only=True)
     attachments = fields.List(fields.Raw(), dump_only=True)
 
+
+# Экземпляры схем создаются один раз при импорте модуля
+conversation_schema = ConversationSchema()
@@ -1,20 +1,167 @@
 
 # app/blueprints/conversations/services.py
 from datetime import datetime
-from sqlalchemy import and_, or_, desc, func
-from app.extensions import db
+from sqlalchemy import or_, desc, func, exists, select, update, text
+from sqlalchemy.orm import joinedload, selectinload
+from app.extensions import db, cache
 from app.models.conversation import Conversation, ConversationParticipant, Message, MessageAttachment
 from app.models.user import User
 from app.models.base import get_status_by_code
 from app.utils.exceptions import (
     NotFoundError, AuthorizationError, ValidationError, UserNotFoundError
 )
-from app.utils.pagination import paginate_query
+from app.utils.pagination import paginate_query, paginate_query_windowed, KeysetPagination
+
+
+# Пересчет счетчиков непрочитанных диалогов по сообщениям (тот же запрос,
+# что и начальное заполнение); меняются только разошедшиеся значения
+_RECONCILE_UNREAD_COUNTS = text('''
+    UPDATE users u SET unread_conversation_count = COALESCE(c.cnt, 0)
+    FROM users u2
+    LEFT JOIN (
+        SELECT cp.user_id, COUNT(DISTINCT cp.conversation_id) AS cnt
+        FROM conversation_participants cp
+        JOIN messages m ON m.conversation_id = cp.conversation_id
+            AND m.sender_id <> cp.user_id
+            AND m.is_deleted = false
+            AND (cp.last_read_date IS NULL OR m.sent_date > cp.last_read_date)
+        WHERE cp.is_active = true
+        GROUP BY cp.user_id
+    ) c ON c.user_id = u2.user_id
+    WHERE u.user_id = u2.user_id
+        AND u.unread_conversation_count IS DISTINCT FROM COALESCE(c.cnt, 0)
+    RETURNING u.user_id
+''')
 
 
 class ConversationService:
     """Сервис для работы с диалогами"""
     
+    # Время жизни закэшированного количества диалогов пользователя (секунды)
+    CONVERSATIONS_COUNT_TIMEOUT = 30
+    
+    # Время жизни закэшированного счетчика непрочитанных диалогов (секунды)
+    UNREAD_COUNT_TIMEOUT = 60
+    
+    @staticmethod
+    def _unread_count_key(user_id):
+        """Ключ кэша счетчика непрочитанных диалогов пользователя"""
+        return f'conversations:unread:{user_id}'
+    
+    @staticmethod
+    def forget_unread_counts(user_ids):
+        """Сброс закэшированных счетчиков непрочитанных диалогов (после commit)"""
+        if user_ids:
+            cache.delete_many(*(ConversationService._unread_count_key(user_id) for user_id in user_ids))
+    
+    @staticmethod
+    def _conversations_count_key(user_id):
+        """Ключ кэша количества диалогов пользователя"""
+        return f'conversations:count:{user_id}'
+    
+    @staticmethod
+    def forget_conversations_count(conversation):
+        """Сброс закэшированного количества диалогов у всех участников диалога"""
+        cache.delete_many(*(
+            ConversationService._conversations_count_key(participant.user_id)
+            for participant in conversation.participants
+        ))
+    
+    @staticmethod
+    def _has_unread(conversation_id, exclude_message_id=None):
+        """
+        Условие для ConversationParticipant: в диалоге есть сообщения собеседников
+        новее last_read_date участника
+        """
+        condition = exists().where(
+            Message.conversation_id == conversation_id,
+            Message.sender_id != ConversationParticipant.user_id,
+            Message.is_deleted == False,
+            or_(
+                ConversationParticipant.last_read_date.is_(None),
+                Message.sent_date > ConversationParticipant.last_read_date
+            )
+        )
+        
+        if exclude_message_id is not None:
+            condition = condition.where(Message.message_id != exclude_message_id)
+        
+        return condition
+    
+    @staticmethod
+    def _lock_participants(conversation_id, exclude_user_id):
+        """
+        Блокировка строк участников диалога (кроме exclude_user_id) до конца транзакции
+        
+        Параллельные отправка и удаление сообщений в одном диалоге проверяют
+        наличие непрочитанных по очереди: иначе при READ COMMITTED обе
+        транзакции видят "нет непрочитанных" и счетчик меняется дважды.
+        Строки блокируются в порядке user_id, чтобы не было взаимоблокировок.
+        """
+        db.session.execute(
+            select(ConversationParticipant.user_id).where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id != exclude_user_id,
+                ConversationParticipant.is_active == True
+            ).order_by(ConversationParticipant.user_id).with_for_update()
+        )
+    
+    @staticmethod
+    def reconcile_unread_counts():
+        """
+        Пересчет счетчиков непрочитанных диалогов (периодическая задача)
+        
+        Returns:
+            Количество исправленных счетчиков
+        """
+        user_ids = db.session.execute(_RECONCILE_UNREAD_COUNTS).scalars().all()
+        db.session.commit()
+        ConversationService.forget_unread_counts(user_ids)
+        return len(user_ids)
+    
+    @staticmethod
+    def _change_unread_count(participants_query, delta):
+        """
+        Изменение счетчика непрочитанных диалогов у участников из подзапроса (без commit)
+        
+        Returns:
+            ID пользователей, у которых изменился счетчик
+        """
+        result = db.session.execute(
+            update(User).where(User.user_id.in_(participants_query)).values(
+                unread_conversation_count=func.greatest(User.unread_conversation_count + delta, 0)
+            ).returning(User.user_id),
+            execution_options={'synchronize_session': False}
+        )
+        return result.scalars().all()
+    
+    @staticmethod
+    def _mark_read(conversation_id, user_id):
+        """
+        Отметка диалога прочитанным, если в нем есть непрочитанные сообщения
+        
+        Счетчик непрочитанных диалогов пользователя уменьшается в той же транзакции.
+        
+        Returns:
+            True если диалог был непрочитанным
+        """
+        updated = ConversationParticipant.query.filter(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id == user_id,
+            ConversationParticipant.is_active == True,
+            ConversationService._has_unread(conversation_id)
+        ).update({'last_read_date': datetime.utcnow()}, synchronize_session=False)
+        
+        if updated:
+            User.query.filter(User.user_id == user_id).update(
+                {User.unread_conversation_count: func.greatest(User.unread_conversation_count - 1, 0)},
+                synchronize_session=False
+            )
+            db.session.commit()
+            ConversationService.forget_unread_counts([user_id])
+        
+        return bool(updated)
+    
     @staticmethod
     def create_conversation(creator_id, participant_id, conversation_type='user_chat', 
                           subject=None, related_entity_id=None, initial_message=None):
@@ -37,8 +184,10 @@ class ConversationService:
             ValidationError: Если диалог уже существует
         """
         # Проверяем существование участника
-        participant = User.query.get(participant_id)
-        if not participant or not participant.is_active:
+        participant_active = db.session.query(User.is_active).filter(
+            User.user_id == participant_id
+        ).scalar()
+        if not participant_active:
             raise UserNotFoundError(participant_id)
         
         # Проверяем, нет ли уже диалога между этими пользователями
@@ -52,57 +201,73 @@ class ConversationService:
         # Получаем статус
         active_status = get_status_by_code('conversation_status', 'active')
         
-        # Создаем диалог
+        # Диалог, участники и начальное сообщение сохраняются одной транзакцией;
+        # ID проставляются при единственном flush через связи
+        sent_date = datetime.utcnow()
         conversation = Conversation(
             conversation_type=conversation_type,
             subject=subject,
             related_entity_id=related_entity_id,
-            status_id=active_status.status_id if active_status else None
+            status_id=active_status.status_id if active_status else None,
+            last_message_date=sent_date if initial_message else None
         )
-        conversation.save()
         
-        # Добавляем участников
-        conversation.add_participant(creator_id, 'participant')
-        conversation.add_participant(participant_id, 'participant')
+        user_ids = list(dict.fromkeys((creator_id, participant_id)))
+        conversation.participants = [
+            ConversationParticipant(user_id=user_id, role='participant')
+            for user_id in user_ids
+        ]
         
-        # Отправляем начальное сообщение
+        unread_user_ids = []
         if initial_message:
-            ConversationService.send_message(
-                conversation.conversation_id,
-                creator_id,
-                initial_message
+            db.session.add(Message(
+                conversation=conversation,
+                sender_id=creator_id,
+                message_text=initial_message,
+                message_type='text',
+                sent_date=sent_date,
+                meta_data={}
+            ))
+            
+            # Новый диалог непрочитан у всех, кроме создателя
+            unread_user_ids = ConversationService._change_unread_count(
+                [user_id for user_id in user_ids if user_id != creator_id], 1
             )
         
+        db.session.add(conversation)
+        db.session.commit()
+        
+        ConversationService.forget_unread_counts(unread_user_ids)
+        ConversationService.forget_conversations_count(conversation)
+        
         return conversation
     
     @staticmethod
     def _find_existing_conversation(user1_id, user2_id, related_entity_id=None):
         """Поиск существующего диалога между пользователями"""
-        query = db.session.query(Conversation).join(ConversationParticipant).filter(
+        def participant(condition):
+            return exists().where(
+                ConversationParticipant.conversation_id == Conversation.conversation_id,
+                ConversationParticipant.is_active == True,
+                condition
+            )
+        
+        # Активные участники диалога - ровно эти двое пользователей (одним запросом)
+        query = Conversation.query.filter(
             Conversation.conversation_type == 'user_chat',
-            Conversation.is_active == True
+            Conversation.is_active == True,
+            participant(ConversationParticipant.user_id == user1_id),
+            participant(ConversationParticipant.user_id == user2_id),
+            ~participant(ConversationParticipant.user_id.notin_([user1_id, user2_id]))
         )
         
         if related_entity_id:
             query = query.filter(Conversation.related_entity_id == related_entity_id)
         
-        # Находим диалоги, где участвуют оба пользователя
-        conversations = query.filter(
-            ConversationParticipant.user_id.in_([user1_id, user2_id])
-        ).group_by(Conversation.conversation_id).having(
-            func.count(ConversationParticipant.user_id) == 2
-        ).all()
-        
-        # Проверяем, что участников именно двое и это нужные пользователи
-        for conv in conversations:
-            participant_ids = [p.user_id for p in conv.get_participants()]
-            if set(participant_ids) == {user1_id, user2_id}:
-                return conv
-        
-        return None
+        return query.first()
     
     @staticmethod
-    def get_user_conversations(user_id, page=1, per_page=20):
+    def get_user_conversations(user_id, page=1, per_page=20, after=None):
         """
         Получение диалогов пользователя
         
@@ -110,20 +275,44 @@ class ConversationService:
             user_id: ID пользователя
             page: Номер страницы
             per_page: Диалогов на странице
+            after: Курсор keyset пагинации (page игнорируется)
             
         Returns:
             Диалоги с пагинацией
         """
-        query = Conversation.query.join(ConversationParticipant).filter(
+        # Связи, нужные для to_dict_many(), загружаются пакетно на всю страницу
+        query = Conversation.query.join(ConversationParticipant).options(
+            joinedload(Conversation.status),
+            selectinload(Conversation.participants).joinedload(ConversationParticipant.user)
+        ).filter(
             ConversationParticipant.user_id == user_id,
             ConversationParticipant.is_active == True,
             Conversation.is_active == True
-        ).order_by(
-            desc(Conversation.last_message_date),
+        )
+        
+        if after is not None:
+            # last_message_date пуст у диалогов без сообщений (например, обращения
+            # в поддержку): такие диалоги идут в конце списка
+            return KeysetPagination(
+                query,
+                [(Conversation.last_message_date, 'desc', 'nulls_last'), (Conversation.conversation_id, 'desc')],
+                after=after,
+                per_page=per_page
+            )
+        
+        # Количество диалогов кэшируется ненадолго, чтобы не считать count(*) на каждой странице
+        count_key = ConversationService._conversations_count_key(user_id)
+        total = cache.get(count_key)
+        if total is None:
+            total = query.order_by(None).count()
+            cache.set(count_key, total, timeout=ConversationService.CONVERSATIONS_COUNT_TIMEOUT)
+        
+        query = query.order_by(
+            desc(Conversation.last_message_date).nulls_last(),
             desc(Conversation.created_date)
         )
         
-        return paginate_query(query, page, per_page)
+        return paginate_query(query, page, per_page, total=total)
     
     @staticmethod
     def get_conversation(conversation_id, user_id):
@@ -141,21 +330,35 @@ class ConversationService:
             NotFoundError: Если диалог не найден
             AuthorizationError: Если пользователь не участник
         """
-        conversation = Conversation.query.get(conversation_id)
-        if not conversation or not conversation.is_active:
-            raise NotFoundError("Conversation not found")
+        # Диалог и участие пользователя проверяются одним запросом
+        conversation = Conversation.query.join(ConversationParticipant).filter(
+            Conversation.conversation_id == conversation_id,
+            Conversation.is_active == True,
+            ConversationParticipant.user_id == user_id,
+            ConversationParticipant.is_active == True
+        ).first()
         
-        # Проверяем, является ли пользователь участником
-        participant = conversation.get_participant(user_id)
-        if not participant:
-            raise AuthorizationError("You are not a participant of this conversation")
+        if conversation:
+            return conversation
         
-        return conversation
+        # Причина отказа выясняется только при ошибке
+        conversation_exists = db.session.query(Conversation.conversation_id).filter(
+            Conversation.conversation_id == conversation_id,
+            Conversation.is_active == True
+        ).scalar()
+        
+        if conversation_exists is None:
+            raise NotFoundError("Conversation not found")
+        
+        raise AuthorizationError("You are not a participant of this conversation")
     
     @staticmethod
-    def get_conversation_messages(conversation_id, user_id, page=1, per_page=50):
+    def get_messages_and_mark_read(conversation_id, user_id, page=1, per_page=50):
         """
-        Получение сообщений диалога
+        Получение сообщений диалога с отметкой диалога как прочитанного
+        
+        Доступ к диалогу проверяется один раз; last_read_date обновляется
+        только если в диалоге есть непрочитанные сообщения собеседников.
         
         Args:
             conversation_id: ID диалога
@@ -170,16 +373,22 @@ class ConversationService:
             NotFoundError: Если диалог не найден
             AuthorizationError: Если пользователь не участник
         """
-        # Проверяем доступ к диалогу
-        conversation = ConversationService.get_conversation(conversation_id, user_id)
+        ConversationService.get_conversation(conversation_id, user_id)
         
-        # Получаем сообщения
-        query = Message.query.filter(
+        # Отмечаем прочитанным до выборки, чтобы commit не сбрасывал
+        # загруженные сообщения
+        ConversationService._mark_read(conversation_id, user_id)
+        
+        # Отправители и вложения для to_dict() загружаются пакетно на всю страницу
+        query = Message.query.options(
+            joinedload(Message.sender),
+            selectinload(Message.attachments)
+        ).filter(
             Message.conversation_id == conversation_id,
             Message.is_deleted == False
         ).order_by(desc(Message.sent_date))
         
-        return paginate_query(query, page, per_page)
+        return paginate_query_windowed(query, page, per_page)
     
     @staticmethod
     def send_message(conversation_id, sender_id, message_text, message_type='text',
@@ -205,6 +414,19 @@ class ConversationService:
         # Проверяем доступ к диалогу
         conversation = ConversationService.get_conversation(conversation_id, sender_id)
         
+        # Диалог становится непрочитанным у участников, прочитавших его полностью;
+        # счетчик меняется в одной транзакции с сохранением сообщения
+        ConversationService._lock_participants(conversation_id, sender_id)
+        unread_user_ids = ConversationService._change_unread_count(
+            select(ConversationParticipant.user_id).where(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id != sender_id,
+                ConversationParticipant.is_active == True,
+                ~ConversationService._has_unread(conversation_id)
+            ),
+            1
+        )
+        
         # Создаем сообщение
         message = Message(
             conversation_id=conversation_id,
@@ -212,12 +434,16 @@ class ConversationService:
             message_text=message_text,
             message_type=message_type,
             parent_message_id=parent_message_id,
-            meta_data=meta_data or {}
+            meta_data=meta_data or {},
+            sent_date=datetime.utcnow()
         )
-        message.save()
         
-        # Обновляем время последнего сообщения в диалоге
-        conversation.update_last_message_date()
+        # Время последнего сообщения обновляется в той же транзакции,
+        # без повторного чтения последнего сообщения
+        conversation.last_message_date = message.sent_date
+        message.save()
+        ConversationService.forget_unread_counts(unread_user_ids)
+        ConversationService.forget_conversations_count(conversation)
         
         # TODO: Отправить уведомления другим участникам
         
@@ -279,11 +505,31 @@ class ConversationService:
         # Проверяем права на удаление
         if message.sender_id != user_id:
             # Админы могут удалять любые сообщения
-            user = User.query.get(user_id)
-            if not user or user.user_type != 'admin':
+            user_type = db.session.query(User.user_type).filter(
+                User.user_id == user_id
+            ).scalar()
+            if user_type != 'admin':
                 raise AuthorizationError("You can only delete your own messages")
         
+        # Диалог становится прочитанным у участников, для которых это сообщение
+        # было единственным непрочитанным
+        ConversationService._lock_participants(message.conversation_id, message.sender_id)
+        read_user_ids = ConversationService._change_unread_count(
+            select(ConversationParticipant.user_id).where(
+                ConversationParticipant.conversation_id == message.conversation_id,
+                ConversationParticipant.user_id != message.sender_id,
+                ConversationParticipant.is_active == True,
+                or_(
+                    ConversationParticipant.last_read_date.is_(None),
+                    ConversationParticipant.last_read_date < message.sent_date
+                ),
+                ~ConversationService._has_unread(message.conversation_id, exclude_message_id=message.message_id)
+            ),
+            -1
+        )
+        
         message.soft_delete()
+        ConversationService.forget_unread_counts(read_user_ids)
         return True
     
     @staticmethod
@@ -302,8 +548,8 @@ class ConversationService:
             NotFoundError: Если диалог не найден
             AuthorizationError: Если пользователь не участник
         """
-        conversation = ConversationService.get_conversation(conversation_id, user_id)
-        conversation.mark_as_read(user_id)
+        ConversationService.get_conversation(conversation_id, user_id)
+        ConversationService._mark_read(conversation_id, user_id)
         return True
     
     @staticmethod
@@ -317,23 +563,18 @@ class ConversationService:
         Returns:
             Количество непрочитанных диалогов
         """
-        # Получаем диалоги где есть новые сообщения
-        subquery = db.session.query(Message.conversation_id).join(
-            ConversationParticipant,
-            and_(
-                Message.conversation_id == ConversationParticipant.conversation_id,
-                ConversationParticipant.user_id == user_id
-            )
-        ).filter(
-            Message.sender_id != user_id,
-            Message.is_deleted == False,
-            or_(
-                ConversationParticipant.last_read_date.is_(None),
-                Message.sent_date > ConversationParticipant.last_read_date
-            )
-        ).distinct().subquery()
-        
-        return db.session.query(func.count()).select_from(subquery).scalar()
+        # Счетчик денормализован в users.unread_conversation_count; опрашивается
+        # клиентами постоянно, поэтому кэшируется до ближайшего изменения
+        cache_key = ConversationService._unread_count_key(user_id)
+        count = cache.get(cache_key)
+        
+        if count is None:
+            count = db.session.query(User.unread_conversation_count).filter(
+                User.user_id == user_id
+            ).scalar() or 0
+            cache.set(cache_key, count, timeout=ConversationService.UNREAD_COUNT_TIMEOUT)
+        
+        return count
     
     @staticmethod
     def leave_conversation(conversation_id, user_id):
@@ -355,11 +596,15 @@ class ConversationService:
         participant = conversation.get_participant(user_id)
         
         if participant:
+            # Непрочитанный диалог перестает учитываться в счетчике вышедшего участника
+            ConversationService._mark_read(conversation_id, user_id)
             participant.soft_delete()
             
             # Если остался только один участник, деактивируем диалог
             active_participants = conversation.get_participants()
             if len(active_participants) <= 1:
                 conversation.soft_delete()
+            
+            ConversationService.forget_conversations_count(conversation)
         
         return True
\ No newline at end of file
@@ -309,14 +309,17 @@ class ListingService:
         if params.get('is_urgent'):
             query = query.filter(Listing.is_urgent == True)
         
-        # Автомобильные фильтры (через JSONB)
+        # Условия по listing_details собираются и присоединяются одним JOIN
+        details_conditions = []
+        
+        # Автомобильные фильтры (через JSONB, индексы idx_listing_details_*)
         car_filters = ['brand_id', 'model_id', 'body_type_id', 'engine_type_id', 
                       'transmission_id', 'drive_type_id', 'color_id']
         
         for filter_name in car_filters:
             value = params.get(filter_name)
             if value:
-                query = query.join(ListingDetails).filter(
+                details_conditions.append(
                     ListingDetails.searchable_fields[filter_name].astext.cast(db.Integer) == value
                 )
         
@@ -325,12 +328,12 @@ class ListingService:
         year_to = params.get('year_to')
         
         if year_from:
-            query = query.join(ListingDetails).filter(
+            details_conditions.append(
                 ListingDetails.searchable_fields['year'].astext.cast(db.Integer) >= year_from
             )
         
         if year_to:
-            query = query.join(ListingDetails).filter(
+            details_conditions.append(
                 ListingDetails.searchable_fields['year'].astext.cast(db.Integer) <= year_to
             )
         
@@ -339,22 +342,25 @@ class ListingService:
         mileage_to = params.get('mileage_to')
         
         if mileage_from:
-            query = query.join(ListingDetails).filter(
+            details_conditions.append(
                 ListingDetails.details['mileage'].astext.cast(db.Integer) >= mileage_from
             )
         
         if mileage_to:
-            query = query.join(ListingDetails).filter(
+            details_conditions.append(
                 ListingDetails.details['mileage'].astext.cast(db.Integer) <= mileage_to
             )
         
         # Фильтр по состоянию
         condition = params.get('condition')
         if condition:
-            query = query.join(ListingDetails).filter(
+            details_conditions.append(
                 ListingDetails.details['condition'].astext == condition
             )
         
+        if details_conditions:
+            query = query.join(ListingDetails).filter(*details_conditions)
+        
         return query
     
     @staticmethod
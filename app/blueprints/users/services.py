@@ -72,6 +72,10 @@ class UserService:
         
         user.updated_date = datetime.utcnow()
         db.commit()
+        
+        if data.get('email'):
+            from app.blueprints.auth.services import AuthService
+            AuthService.forget_unknown_identifiers(data['email'])
         return user
     
     @staticmethod
@@ -227,6 +231,7 @@ class UserService:
         # Здесь можно будет добавить деактивацию объявлений когда создадим модель Listing
         
         db.commit()
+        User.invalidate_auth_state(user_id)
         return True
     
     @staticmethod
@@ -240,6 +245,11 @@ class UserService:
         user.is_active = True
         user.updated_date = datetime.utcnow()
         db.commit()
+        User.invalidate_auth_state(user_id)
+        
+        # Вход заблокированного пользователя закэшировал промах по его идентификаторам
+        from app.blueprints.auth.services import AuthService
+        AuthService.forget_unknown_identifiers(user.phone_number, user.email)
         return True
     
     @staticmethod
@@ -306,6 +316,7 @@ class UserService:
             else:
                 user.verification_status = 'email_verified'
             db.commit()
+            User.invalidate_auth_state(user_id)
             return True
         return False
     
@@ -319,5 +330,6 @@ class UserService:
             else:
                 user.verification_status = 'phone_verified'
             db.commit()
+            User.invalidate_auth_state(user_id)
             return True
         return False
\ No newline at end of file
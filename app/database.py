@@ -9,13 +9,9 @@ from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import StaticPool
 from flask import current_app, g
 from flask_sqlalchemy import SQLAlchemy
-import logging
 
 db = SQLAlchemy()
 
-# Настройка логирования для SQLAlchemy
-logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
-
 # Метаданные для автоматического именования ограничений
 meta_data = MetaData(naming_convention={
     "ix": "ix_%(column_0_label)s",
@@ -99,10 +95,8 @@ class DatabaseManager:
     
     def get_db(self):
         """Получение сессии базы данных"""
-        print('ХУЙНЯ')
         if 'db' not in g:
             g.db = db.session
-        print(' НЕ ХУЙНЯ')    
         return g.db
     
     def close_db(self, error=None):
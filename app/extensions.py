@@ -80,8 +80,9 @@ def missing_token_callback(error):
 def add_claims_to_jwt(identity):
     """Добавление дополнительных claims в JWT"""
     from app.models.user import User
-    user = User.query.get(identity)
+    # Кэшированное состояние вместо загрузки пользователя при каждой выдаче токена
+    state = User.get_auth_state(int(identity))
     return {
-        'user_type': user.user_type if user else 'regular',
-        'is_verified': user.verification_status == 'fully_verified' if user else False
+        'user_type': state['user_type'] or 'regular',
+        'is_verified': state['is_verified']
     }
\ No newline at end of file
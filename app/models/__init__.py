@@ -21,7 +21,10 @@ from .base import (
     CategoryTree, 
     Category,
     get_or_create,
+    StatusRef,
     get_status_by_code,
+    warm_status_cache,
+    clear_status_cache,
     get_active_statuses
 )
 
@@ -109,7 +112,8 @@ __all__ = [
     'MediaStorage', 'MediaUploadHelper',
     
     # Утилиты
-    'get_or_create', 'get_status_by_code', 'get_active_statuses',
+    'get_or_create', 'StatusRef', 'get_status_by_code', 'warm_status_cache',
+    'clear_status_cache', 'get_active_statuses',
     'get_car_brands_with_models', 'get_car_hierarchy', 'get_car_attributes_grouped',
     'get_car_reference_data', 'validate_car_year', 'get_years_range',
     'get_allowed_extensions', 'is_allowed_file', 'get_media_type_from_filename',
@@ -1,4 +1,5 @@
 # app/models/base.py
+from collections import namedtuple
 from datetime import datetime
 from sqlalchemy import Column, Integer, DateTime, Boolean, String, Text, DECIMAL, BigInteger
 from sqlalchemy.ext.declarative import declared_attr
@@ -215,12 +216,47 @@ def get_or_create(model, **kwargs):
         return instance, True
 
 
+# Справочник статусов практически не меняется, поэтому найденные статусы
+# кэшируются в памяти процесса как легкие кортежи, не привязанные к сессии
+StatusRef = namedtuple('StatusRef', ['status_id', 'status_code', 'status_name'])
+
+_status_cache = {}
+
+
 def get_status_by_code(group_code, status_code):
     """Получить статус по коду группы и коду статуса"""
-    return Status.query.join(StatusGroup).filter(
-        StatusGroup.group_code == group_code,
-        Status.status_code == status_code
-    ).first()
+    key = (group_code, status_code)
+    status = _status_cache.get(key)
+    
+    if status is None:
+        row = db.session.query(
+            Status.status_id, Status.status_code, Status.status_name
+        ).join(StatusGroup).filter(
+            StatusGroup.group_code == group_code,
+            Status.status_code == status_code
+        ).first()
+        
+        if row is None:
+            return None
+        
+        status = _status_cache[key] = StatusRef(*row)
+    
+    return status
+
+
+def warm_status_cache():
+    """Предзагрузка всех статусов в кэш одним запросом"""
+    rows = db.session.query(
+        StatusGroup.group_code, Status.status_id, Status.status_code, Status.status_name
+    ).join(StatusGroup).all()
+    
+    for group_code, status_id, status_code, status_name in rows:
+        _status_cache[(group_code, status_code)] = StatusRef(status_id, status_code, status_name)
+
+
+def clear_status_cache():
+    """Сброс кэша статусов (после изменения справочника)"""
+    _status_cache.clear()
 
 
 def get_active_statuses(group_code):
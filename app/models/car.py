@@ -1,6 +1,7 @@
 # app/models/car.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DECIMAL, UniqueConstraint
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DECIMAL, UniqueConstraint, Index, func, select, literal_column
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.orm import joinedload, selectinload
 from app.models.base import BaseModel
 from app.extensions import db
 
@@ -15,11 +16,25 @@ class CarBrand(BaseModel):
     logo_url = Column(String(500))
     country_origin = Column(String(100))
     sort_order = Column(Integer, default=0)
+    # Количество активных объявлений; поддерживается триггерами по listing_details и listings
+    listings_count = Column(Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        Index('idx_car_brands_popular', listings_count.desc(), sort_order,
+              postgresql_where=db.text('is_active = true')),
+        # Список активных марок в порядке сортировки без узла Sort
+        Index('idx_car_brands_active_sort', sort_order, brand_name,
+              postgresql_where=db.text('is_active = true')),
+        # Поиск по подстроке (ILIKE '%...%') через pg_trgm
+        Index('idx_car_brands_name_trgm', 'brand_name', postgresql_using='gin',
+              postgresql_ops={'brand_name': 'gin_trgm_ops'}),
+    )
     
     @classmethod
     def get_popular_brands(cls, limit=20):
         """Получение популярных марок"""
-        return cls.query.filter(cls.is_active == True).order_by(
+        # models загружаются пакетно для models_count в to_dict()
+        return cls.query.options(selectinload(cls.models)).filter(cls.is_active == True).order_by(
             cls.sort_order, cls.brand_name
         ).limit(limit).all()
     
@@ -56,9 +71,16 @@ class CarModel(BaseModel):
     start_year = Column(Integer)
     end_year = Column(Integer)
     body_type_id = Column(Integer, ForeignKey('car_body_types.body_type_id'))
+    # Количество активных объявлений; поддерживается триггерами по listing_details и listings
+    listings_count = Column(Integer, nullable=False, default=0, server_default='0')
     
     __table_args__ = (
         UniqueConstraint('brand_id', 'model_name', name='unique_brand_model'),
+        Index('idx_car_models_popular', 'brand_id', listings_count.desc(), 'model_name',
+              postgresql_where=db.text('is_active = true')),
+        # Поиск по подстроке (ILIKE '%...%') через pg_trgm
+        Index('idx_car_models_name_trgm', 'model_name', postgresql_using='gin',
+              postgresql_ops={'model_name': 'gin_trgm_ops'}),
     )
     
     # Отношения
@@ -369,6 +391,15 @@ class CarFeature(BaseModel):
     icon_url = Column(String(500))
     sort_order = Column(Integer, default=0)
     
+    __table_args__ = (
+        # Список активных опций в порядке сортировки без узла Sort
+        Index('idx_car_features_active_sort', sort_order, feature_name,
+              postgresql_where=db.text('is_active = true')),
+        # Поиск по подстроке (ILIKE '%...%') через pg_trgm
+        Index('idx_car_features_name_trgm', 'feature_name', postgresql_using='gin',
+              postgresql_ops={'feature_name': 'gin_trgm_ops'}),
+    )
+    
     # Отношения
     category = db.relationship('Category', backref='car_features')
     
@@ -383,7 +414,7 @@ class CarFeature(BaseModel):
     @classmethod
     def get_popular_features(cls, limit=20):
         """Получение популярных опций"""
-        return cls.query.filter(cls.is_active == True).order_by(
+        return cls.query.options(joinedload(cls.category)).filter(cls.is_active == True).order_by(
             cls.sort_order, cls.feature_name
         ).limit(limit).all()
     
@@ -410,14 +441,35 @@ class CarFeature(BaseModel):
 
 
 # Вспомогательные функции для работы с автомобильными справочниками
+def _active_models_query():
+    """
+    Активные модели со связями, используемыми в CarModel.to_dict()
+    
+    Марка и тип кузова загружаются JOIN, поколения - одним дополнительным
+    запросом на все модели, вместо отдельных запросов на каждую модель.
+    """
+    return CarModel.query.options(
+        joinedload(CarModel.brand),
+        joinedload(CarModel.body_type),
+        selectinload(CarModel.generations)
+    ).filter(CarModel.is_active == True)
+
+
 def get_car_brands_with_models():
     """Получение марок с моделями"""
-    brands = CarBrand.query.filter(CarBrand.is_active == True).order_by(CarBrand.sort_order).all()
-    result = []
+    brands = CarBrand.query.options(selectinload(CarBrand.models)).filter(
+        CarBrand.is_active == True
+    ).order_by(CarBrand.sort_order).all()
+    
+    # Модели всех марок загружаются одним запросом и группируются по марке
+    models_by_brand = {}
+    for model in _active_models_query().order_by(CarModel.model_name):
+        models_by_brand.setdefault(model.brand_id, []).append(model.to_dict())
     
+    result = []
     for brand in brands:
         brand_dict = brand.to_dict()
-        brand_dict['models'] = [model.to_dict() for model in brand.models if model.is_active]
+        brand_dict['models'] = models_by_brand.get(brand.brand_id, [])
         result.append(brand_dict)
     
     return result
@@ -439,10 +491,9 @@ def get_car_hierarchy(brand_id=None, model_id=None):
         result['brand'] = brand.to_dict()
         
         if model_id:
-            model = CarModel.query.filter(
+            model = _active_models_query().filter(
                 CarModel.model_id == model_id,
-                CarModel.brand_id == brand_id,
-                CarModel.is_active == True
+                CarModel.brand_id == brand_id
             ).first()
             
             if not model:
@@ -451,7 +502,10 @@ def get_car_hierarchy(brand_id=None, model_id=None):
             result['model'] = model.to_dict()
             result['generations'] = [gen.to_dict() for gen in model.generations if gen.is_active]
         else:
-            result['models'] = [model.to_dict() for model in brand.models if model.is_active]
+            models = _active_models_query().filter(
+                CarModel.brand_id == brand_id
+            ).order_by(CarModel.model_name)
+            result['models'] = [model.to_dict() for model in models]
     else:
         brands = CarBrand.get_popular_brands()
         result['brands'] = [brand.to_dict() for brand in brands]
@@ -477,16 +531,86 @@ def get_car_attributes_grouped():
     return result
 
 
+def _json_array(query, *order_by):
+    """
+    Скалярный подзапрос, собирающий строки запроса в JSON массив объектов
+    
+    Ключи объектов - имена (label) колонок запроса; порядок элементов задается
+    именами колонок order_by.
+    """
+    rows = query.subquery()
+    row_object = func.json_build_object(
+        *[part for column in rows.c for part in (column.name, column)]
+    )
+    return select(func.coalesce(
+        func.json_agg(aggregate_order_by(row_object, *[rows.c[name] for name in order_by])),
+        literal_column("'[]'::json")
+    )).scalar_subquery()
+
+
 def get_car_reference_data():
-    """Получение всех справочных данных для автомобилей"""
-    return {
-        'body_types': [bt.to_dict() for bt in CarBodyType.get_all_active()],
-        'engine_types': [et.to_dict() for et in CarEngineType.get_all_active()],
-        'transmission_types': [tt.to_dict() for tt in CarTransmissionType.get_all_active()],
-        'drive_types': [dt.to_dict() for dt in CarDriveType.get_all_active()],
-        'colors': [c.to_dict() for c in CarColor.get_popular_colors()],
-        'features': [f.to_dict() for f in CarFeature.get_popular_features()]
-    }
+    """
+    Получение всех справочных данных для автомобилей
+    
+    Все справочники собираются в JSON на стороне PostgreSQL одним запросом;
+    структура совпадает с to_dict() соответствующих моделей.
+    """
+    body_types = _json_array(db.session.query(
+        CarBodyType.body_type_id.label('body_type_id'),
+        CarBodyType.body_type_name.label('body_type_name'),
+        CarBodyType.icon_url.label('icon_url'),
+        CarBodyType.sort_order.label('sort_order')
+    ).filter(CarBodyType.is_active == True), 'sort_order')
+    
+    engine_types = _json_array(db.session.query(
+        CarEngineType.engine_type_id.label('engine_type_id'),
+        CarEngineType.engine_type_name.label('engine_type_name'),
+        CarEngineType.sort_order.label('sort_order')
+    ).filter(CarEngineType.is_active == True), 'sort_order')
+    
+    transmission_types = _json_array(db.session.query(
+        CarTransmissionType.transmission_id.label('transmission_id'),
+        CarTransmissionType.transmission_name.label('transmission_name'),
+        CarTransmissionType.sort_order.label('sort_order')
+    ).filter(CarTransmissionType.is_active == True), 'sort_order')
+    
+    drive_types = _json_array(db.session.query(
+        CarDriveType.drive_type_id.label('drive_type_id'),
+        CarDriveType.drive_type_name.label('drive_type_name'),
+        CarDriveType.sort_order.label('sort_order')
+    ).filter(CarDriveType.is_active == True), 'sort_order')
+    
+    # Популярные цвета (как в CarColor.get_popular_colors)
+    colors = _json_array(db.session.query(
+        CarColor.color_id.label('color_id'),
+        CarColor.color_name.label('color_name'),
+        CarColor.color_hex.label('color_hex'),
+        CarColor.sort_order.label('sort_order')
+    ).filter(CarColor.is_active == True).order_by(CarColor.sort_order).limit(10), 'sort_order')
+    
+    # Популярные опции (как в CarFeature.get_popular_features)
+    from app.models.base import Category
+    features = _json_array(db.session.query(
+        CarFeature.feature_id.label('feature_id'),
+        CarFeature.feature_name.label('feature_name'),
+        CarFeature.category_id.label('category_id'),
+        Category.category_name.label('category_name'),
+        CarFeature.icon_url.label('icon_url'),
+        CarFeature.sort_order.label('sort_order')
+    ).outerjoin(
+        Category, Category.category_id == CarFeature.category_id
+    ).filter(
+        CarFeature.is_active == True
+    ).order_by(CarFeature.sort_order, CarFeature.feature_name).limit(20), 'sort_order', 'feature_name')
+    
+    return db.session.query(func.json_build_object(
+        'body_types', body_types,
+        'engine_types', engine_types,
+        'transmission_types', transmission_types,
+        'drive_types', drive_types,
+        'colors', colors,
+        'features', features
+    )).scalar()
 
 
 def validate_car_year(year):
@@ -23,6 +23,9 @@ class Conversation(EntityBasedModel):
             name='check_conversation_type'
         ),
         Index('idx_conversations_last_message', 'last_message_date'),
+        # Keyset пагинация списка диалогов
+        Index('idx_conversations_last_message_id', last_message_date.desc().nulls_last(), conversation_id.desc(),
+              postgresql_where=db.text('is_active = true')),
     )
     
     # Отношения
@@ -94,9 +97,63 @@ class Conversation(EntityBasedModel):
     
     def to_dict(self, user_id=None):
         """Преобразование в словарь"""
-        last_message = self.get_last_message()
         participants = self.get_participants()
+        unread_count = self.get_unread_count(user_id) if user_id else None
+        
+        return self._build_dict(participants, self.get_last_message(), user_id, unread_count)
+    
+    @classmethod
+    def to_dict_many(cls, conversations, user_id):
+        """
+        Преобразование списка диалогов в словари для пользователя
+        
+        Последние сообщения и счетчики непрочитанных загружаются двумя
+        запросами на всю страницу, участники - пакетно (selectinload).
+        """
+        conversation_ids = [conversation.conversation_id for conversation in conversations]
+        if not conversation_ids:
+            return []
+        
+        # Последнее неудаленное сообщение каждого диалога
+        last_messages = {
+            message.conversation_id: message
+            for message in Message.query.filter(
+                Message.conversation_id.in_(conversation_ids),
+                Message.is_deleted == False
+            ).order_by(
+                Message.conversation_id, Message.sent_date.desc()
+            ).distinct(Message.conversation_id)
+        }
         
+        # Непрочитанные сообщения относительно last_read_date пользователя
+        unread_counts = dict(
+            db.session.query(Message.conversation_id, db.func.count(Message.message_id)).join(
+                ConversationParticipant,
+                db.and_(
+                    ConversationParticipant.conversation_id == Message.conversation_id,
+                    ConversationParticipant.user_id == user_id,
+                    ConversationParticipant.is_active == True
+                )
+            ).filter(
+                Message.conversation_id.in_(conversation_ids),
+                Message.sender_id != user_id,
+                Message.sent_date > db.func.coalesce(ConversationParticipant.last_read_date, datetime.min),
+                Message.is_deleted == False
+            ).group_by(Message.conversation_id).all()
+        )
+        
+        return [
+            conversation._build_dict(
+                [p for p in conversation.participants if p.is_active],
+                last_messages.get(conversation.conversation_id),
+                user_id,
+                unread_counts.get(conversation.conversation_id, 0)
+            )
+            for conversation in conversations
+        ]
+    
+    def _build_dict(self, participants, last_message, user_id=None, unread_count=None):
+        """Словарь диалога из заранее загруженных участников и сообщения"""
         data = {
             'conversation_id': self.conversation_id,
             'entity_id': self.entity_id,
@@ -120,8 +177,8 @@ class Conversation(EntityBasedModel):
             }
         
         if user_id:
-            data['unread_count'] = self.get_unread_count(user_id)
-            data['is_participant'] = self.get_participant(user_id) is not None
+            data['unread_count'] = unread_count or 0
+            data['is_participant'] = any(p.user_id == user_id for p in participants)
         
         return data
 
@@ -226,10 +283,31 @@ class Message(EntityBasedModel):
         }
         
         if include_attachments:
-            attachments = self.get_attachments()
-            data['attachments'] = [att.to_dict() for att in attachments]
+            # Связь, а не запрос: при selectinload вложения уже загружены
+            data['attachments'] = [att.to_dict() for att in self.attachments]
         
         return data
+    
+    def to_api_dict(self, include_attachments=True):
+        """
+        Ответ API по сообщению (поля MessageSchema) без marshmallow
+        
+        Отправитель не загружается; вложения - только если include_attachments.
+        """
+        return {
+            'message_id': self.message_id,
+            'entity_id': self.entity_id,
+            'conversation_id': self.conversation_id,
+            'sender_id': self.sender_id,
+            'message_text': self.message_text,
+            'message_type': self.message_type,
+            'sent_date': self.sent_date.isoformat() if self.sent_date else None,
+            'edited_date': self.edited_date.isoformat() if self.edited_date else None,
+            'is_deleted': self.is_deleted,
+            'parent_message_id': self.parent_message_id,
+            'meta_data': self.meta_data,
+            'attachments': [att.to_dict() for att in self.attachments] if include_attachments else []
+        }
 
 
 class MessageAttachment(BaseModel):
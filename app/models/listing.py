@@ -48,6 +48,7 @@ class Listing(EntityBasedModel):
         Index('idx_listings_featured', 'is_featured', 'published_date', postgresql_where=db.text('is_featured = true')),
         Index('idx_listings_expires', 'expires_date', postgresql_where=db.text('expires_date IS NOT NULL')),
         Index('idx_listings_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('idx_listings_active_created', 'created_date', postgresql_where=db.text('is_active = true')),
     )
     
     # Отношения
@@ -326,12 +327,12 @@ class ListingDetails(BaseModel):
     # Индексы для быстрого поиска по JSONB
     __table_args__ = (
         Index('idx_listing_details_jsonb', 'searchable_fields', postgresql_using='gin'),
-        Index('idx_listing_details_brand', 
-              func.cast(searchable_fields['brand_id'], Integer),
-              postgresql_where=db.text('listing_type_id = 1')),
+        # Выражения совпадают с фильтрами поиска: (searchable_fields->>'brand_id')::integer
+        # Без условия listing_type_id: поиск не фильтрует listing_details по типу
+        Index('idx_listing_details_brand',
+              searchable_fields['brand_id'].astext.cast(Integer)),
         Index('idx_listing_details_model',
-              func.cast(searchable_fields['model_id'], Integer),
-              postgresql_where=db.text('listing_type_id = 1')),
+              searchable_fields['model_id'].astext.cast(Integer)),
     )
     
     # Отношения
@@ -25,6 +25,9 @@ class ModerationQueue(BaseModel):
     __table_args__ = (
         Index('idx_moderation_status_priority', 'status_id', 'priority', 'submitted_date'),
         Index('idx_moderation_user', 'user_id', 'submitted_date'),
+        Index('idx_moderation_keyset', priority.desc(), submitted_date, moderation_id),
+        Index('uq_moderation_entity_active', 'entity_id',
+              unique=True, postgresql_where=db.text('is_active = true')),
     )
     
     # Отношения
@@ -73,6 +76,29 @@ class ModerationQueue(BaseModel):
             'notes': self.notes,
             'auto_moderation_score': float(self.auto_moderation_score) if self.auto_moderation_score else None
         }
+    
+    @staticmethod
+    def row_to_dict(row):
+        """
+        Словарь строки колоночного запроса очереди модерации
+        
+        Формат совпадает с to_dict(); имена пользователей уже вычислены в запросе.
+        """
+        return {
+            'moderation_id': row.moderation_id,
+            'entity_id': row.entity_id,
+            'user_id': row.user_id,
+            'user_name': row.user_name,
+            'moderator_id': row.moderator_id,
+            'moderator_name': row.moderator_name,
+            'status': row.status,
+            'priority': row.priority,
+            'rejection_reason': row.rejection_reason,
+            'submitted_date': row.submitted_date.isoformat() if row.submitted_date else None,
+            'moderated_date': row.moderated_date.isoformat() if row.moderated_date else None,
+            'notes': row.notes,
+            'auto_moderation_score': float(row.auto_moderation_score) if row.auto_moderation_score else None
+        }
 
 
 class ReportedContent(BaseModel):
@@ -91,6 +117,9 @@ class ReportedContent(BaseModel):
     
     __table_args__ = (
         Index('idx_reports_status', 'status_id', 'created_date'),
+        # Одна активная жалоба от пользователя на сущность
+        Index('uq_reports_reporter_entity_active', 'reporter_id', 'entity_id',
+              unique=True, postgresql_where=db.text('is_active = true')),
     )
     
     # Отношения
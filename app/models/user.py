@@ -1,11 +1,22 @@
 # app/models/user.py
+import time
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, DECIMAL, ForeignKey, UniqueConstraint
-from sqlalchemy.dialects.postgresql import JSONB, INET
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, DECIMAL, ForeignKey, UniqueConstraint, Computed
+from sqlalchemy.dialects.postgresql import JSONB, INET, TSVECTOR
 from flask_jwt_extended import create_access_token, create_refresh_token
 from app.models.base import BaseModel, EntityBasedModel
-from app.extensions import db
+from app.extensions import db, cache
+
+
+def _user_search_text(first_name, last_name, phone_number, email):
+    """Строка для поиска пользователя (обслуживается индексом idx_users_search_trgm)"""
+    return (
+        db.func.coalesce(first_name, '') + ' ' +
+        db.func.coalesce(last_name, '') + ' ' +
+        phone_number + ' ' +
+        db.func.coalesce(email, '')
+    )
 
 
 class User(EntityBasedModel):
@@ -22,6 +33,14 @@ class User(EntityBasedModel):
     last_login = Column(DateTime)
     verification_status = Column(String(20), default='pending')
     user_type = Column(String(20), default='regular')
+    # Количество диалогов с непрочитанными сообщениями (поддерживает ConversationService)
+    unread_conversation_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Вычисляемый столбец для полнотекстового поиска пользователей в админке
+    search_vector = Column(TSVECTOR, Computed(
+        "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+        "coalesce(email, '') || ' ' || phone_number)",
+        persisted=True
+    ))
 
     support_tickets = db.relationship("SupportTicket", foreign_keys="SupportTicket.user_id", back_populates="user")
     assigned_tickets = db.relationship("SupportTicket", foreign_keys="SupportTicket.assigned_to", back_populates="assigned_user")
@@ -40,6 +59,17 @@ class User(EntityBasedModel):
         # Уникальные индексы только для активных пользователей
         db.Index('idx_users_phone_active', 'phone_number', postgresql_where=db.text('is_active = true')),
         db.Index('idx_users_email_active', 'email', postgresql_where=db.text('is_active = true AND email IS NOT NULL')),
+        db.Index('idx_users_email_lower', db.func.lower(email), unique=True, postgresql_where=db.text('is_active = true AND email IS NOT NULL')),
+        # Счетчики регистраций и список пользователей в админке по дате регистрации
+        db.Index('idx_users_active_regdate', 'registration_date', postgresql_where=db.text('is_active = true')),
+        db.Index('idx_users_search_vector', 'search_vector', postgresql_using='gin'),
+        # Триграммный индекс для поиска по подстроке (требует расширения pg_trgm)
+        db.Index(
+            'idx_users_search_trgm',
+            _user_search_text(first_name, last_name, phone_number, email).label('search_text'),
+            postgresql_using='gin',
+            postgresql_ops={'search_text': 'gin_trgm_ops'}
+        ),
     )
     
     def set_password(self, password):
@@ -56,12 +86,10 @@ class User(EntityBasedModel):
             'user_type': self.user_type,
             'is_verified': self.verification_status == 'fully_verified'
         }
-        print('#7')
         access_token = create_access_token(
             identity=str(self.user_id),
             additional_claims=additional_claims
         )
-        print('#8')
         refresh_token = create_refresh_token(identity=str(self.user_id))
         
         return {
@@ -81,6 +109,7 @@ class User(EntityBasedModel):
         elif self.verification_status == 'email_verified':
             self.verification_status = 'fully_verified'
         db.session.commit()
+        User.invalidate_auth_state(self.user_id)
     
     def verify_email(self):
         """Верификация email"""
@@ -89,6 +118,7 @@ class User(EntityBasedModel):
         elif self.verification_status == 'phone_verified':
             self.verification_status = 'fully_verified'
         db.session.commit()
+        User.invalidate_auth_state(self.user_id)
     
     @property
     def full_name(self):
@@ -107,6 +137,56 @@ class User(EntityBasedModel):
         """Проверка PRO статуса"""
         return self.user_type in ['pro', 'dealer']
     
+    @classmethod
+    def search_text(cls):
+        """Выражение для поиска по имени, телефону и email"""
+        return _user_search_text(cls.first_name, cls.last_name, cls.phone_number, cls.email)
+    
+    # Состояние пользователя для авторизации (активность, тип, верификация)
+    # нужно на каждом авторизованном запросе и при обновлении токена, поэтому
+    # кэшируется; изменения этих полей сбрасывают кэш
+    AUTH_STATE_CACHE_TIMEOUT = 60
+    
+    @staticmethod
+    def _auth_state_cache_key(user_id):
+        return f'auth:user_state:{user_id}'
+    
+    @classmethod
+    def get_auth_state(cls, user_id):
+        """
+        Состояние пользователя для авторизации без загрузки ORM объекта
+        
+        Returns:
+            Словарь is_active, user_type, is_verified; для несуществующего
+            пользователя is_active равен False
+        """
+        key = cls._auth_state_cache_key(user_id)
+        state = cache.get(key)
+        
+        if state is None:
+            row = db.session.query(
+                cls.is_active, cls.user_type, cls.verification_status
+            ).filter(cls.user_id == user_id).first()
+            
+            state = {
+                'is_active': bool(row and row.is_active),
+                'user_type': row.user_type if row else None,
+                'is_verified': bool(row and row.verification_status == 'fully_verified')
+            }
+            cache.set(key, state, timeout=cls.AUTH_STATE_CACHE_TIMEOUT)
+        
+        return state
+    
+    @classmethod
+    def is_user_active(cls, user_id):
+        """Проверка, что пользователь существует и активен"""
+        return cls.get_auth_state(user_id)['is_active']
+    
+    @classmethod
+    def invalidate_auth_state(cls, user_id):
+        """Сброс кэша состояния пользователя (блокировка, смена типа, верификация)"""
+        cache.delete(cls._auth_state_cache_key(user_id))
+    
     @classmethod
     def find_by_phone(cls, phone_number):
         """Поиск пользователя по телефону"""
@@ -117,27 +197,44 @@ class User(EntityBasedModel):
     
     @classmethod
     def find_by_email(cls, email):
-        """Поиск пользователя по email"""
+        """Поиск пользователя по email (без учета регистра, индекс idx_users_email_lower)"""
         return cls.query.filter(
-            cls.email == email,
+            db.func.lower(cls.email) == email.lower(),
             cls.is_active == True
         ).first()
     
-    def to_dict(self, include_sensitive=False):
-        """Преобразование в словарь с возможностью исключения чувствительных данных"""
-        data = {
-            'user_id': self.user_id,
-            'phone_number': self.phone_number,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'full_name': self.full_name,
-            'user_type': self.user_type,
-            'verification_status': self.verification_status,
-            'is_verified': self.is_verified,
-            'registration_date': self.registration_date.isoformat() if self.registration_date else None,
-            'last_login': self.last_login.isoformat() if self.last_login else None
-        }
+    # Поля to_dict() и способ их получения; читаются только колонки и свойства
+    # самой строки users, без обращения к связям
+    _DICT_FIELDS = {
+        'user_id': lambda user: user.user_id,
+        'phone_number': lambda user: user.phone_number,
+        'email': lambda user: user.email,
+        'first_name': lambda user: user.first_name,
+        'last_name': lambda user: user.last_name,
+        'full_name': lambda user: user.full_name,
+        'user_type': lambda user: user.user_type,
+        'verification_status': lambda user: user.verification_status,
+        'is_verified': lambda user: user.is_verified,
+        'registration_date': lambda user: user.registration_date.isoformat() if user.registration_date else None,
+        'last_login': lambda user: user.last_login.isoformat() if user.last_login else None,
+    }
+    DEFAULT_DICT_FIELDS = tuple(_DICT_FIELDS)
+    # Минимальный набор для ответов аутентификации (login, /me): без дат
+    # и отдельных частей имени
+    AUTH_DICT_FIELDS = (
+        'user_id', 'phone_number', 'email', 'full_name',
+        'user_type', 'verification_status', 'is_verified'
+    )
+    
+    def to_dict(self, include_sensitive=False, fields=DEFAULT_DICT_FIELDS):
+        """
+        Преобразование в словарь с возможностью исключения чувствительных данных
+        
+        Args:
+            include_sensitive: Добавить entity_id и is_active
+            fields: Кортеж полей из _DICT_FIELDS (по умолчанию все публичные)
+        """
+        data = {field: User._DICT_FIELDS[field](self) for field in fields}
         
         if include_sensitive:
             data.update({
@@ -301,6 +398,12 @@ class PhoneVerification(BaseModel):
     attempts_count = Column(Integer, default=0)
     ip_address = Column(INET)
     
+    __table_args__ = (
+        # Поиск непроверенного кода по телефону и коду в verify_code
+        db.Index('idx_phone_verification_code', 'phone_number', 'verification_code',
+                 postgresql_where=db.text('verified_at IS NULL')),
+    )
+    
     @classmethod
     def create_verification(cls, phone_number, code, ip_address=None):
         """Создание новой верификации"""
@@ -461,17 +564,24 @@ class LoginAttempt(BaseModel):
         attempt.save()
         return attempt
     
+    # Неудачные попытки с IP считаются в кэше (Redis), а не по таблице
+    RATE_LIMIT_WINDOW_MINUTES = 15
+    
+    @staticmethod
+    def _failures_key(ip_address):
+        return f'login_failures:{ip_address}'
+    
     @classmethod
-    def check_rate_limit(cls, ip_address, minutes=15, max_attempts=5):
-        """Проверка лимита попыток с IP"""
-        since = datetime.utcnow() - timedelta(minutes=minutes)
-        attempts = cls.query.filter(
-            cls.ip_address == ip_address,
-            cls.attempted_at >= since,
-            cls.success == False
-        ).count()
-        
-        return attempts < max_attempts
+    def register_failure(cls, ip_address):
+        """Учет неудачной попытки входа в счетчике лимита"""
+        from app.utils.rate_limit import increment_counter
+        return increment_counter(cls._failures_key(ip_address), cls.RATE_LIMIT_WINDOW_MINUTES * 60)
+    
+    @classmethod
+    def check_rate_limit(cls, ip_address, max_attempts=5):
+        """Проверка лимита неудачных попыток с IP"""
+        from app.utils.rate_limit import get_counter
+        return get_counter(cls._failures_key(ip_address)) < max_attempts
 
 
 class RevokedToken(BaseModel):
@@ -486,14 +596,43 @@ class RevokedToken(BaseModel):
     # Отношения
     user = db.relationship('User', backref='revoked_tokens')
     
+    # Результат проверки отзыва кэшируется: отозванный токен - до истечения
+    # его срока, неотозванный - на короткое время (отзыв перезаписывает ключ)
+    NOT_REVOKED_CACHE_TIMEOUT = 60
+    
+    @staticmethod
+    def _cache_key(jti):
+        return f'auth:revoked:{jti}'
+    
     @classmethod
     def is_jti_blacklisted(cls, jti):
         """Проверка токена в черном списке"""
-        return cls.query.filter(cls.jti == jti).first() is not None
+        key = cls._cache_key(jti)
+        revoked = cache.get(key)
+        
+        if revoked is None:
+            revoked = db.session.query(
+                db.session.query(cls.id).filter(cls.jti == jti).exists()
+            ).scalar()
+            cache.set(key, revoked, timeout=cls.NOT_REVOKED_CACHE_TIMEOUT if not revoked else None)
+        
+        return revoked
     
     @classmethod
-    def revoke_token(cls, jti, user_id):
-        """Отзыв токена"""
+    def revoke_token(cls, jti, user_id, expires_at=None):
+        """
+        Отзыв токена
+        
+        Args:
+            jti: Идентификатор токена
+            user_id: ID пользователя
+            expires_at: Время истечения токена (unix timestamp) - срок хранения
+                признака отзыва в кэше
+        """
         revoked_token = cls(jti=jti, user_id=user_id)
         revoked_token.save()
+        
+        timeout = max(int(expires_at - time.time()), 1) if expires_at else None
+        cache.set(cls._cache_key(jti), True, timeout=timeout)
+        
         return revoked_token
\ No newline at end of file
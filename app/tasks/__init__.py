@@ -1,10 +1,15 @@
 # app/tasks/__init__.py
 from app.extensions import make_celery
-from flask import current_app
 
 
 def init_celery(app):
-    """Инициализация Celery с Flask приложением"""
+    """
+    Инициализация Celery с Flask приложением
+    
+    Задачи объявлены через shared_task и регистрируются в этом
+    экземпляре: он получает брокер из конфигурации и выполняет задачи
+    в контексте приложения.
+    """
     celery = make_celery(app)
     
     # Импортируем все задачи
@@ -12,5 +17,10 @@ def init_celery(app):
     from . import cleanup
     from . import indexing
     from . import analytics
+    from . import admin
+    from . import auth
+    
+    celery.conf.beat_schedule = analytics.BEAT_SCHEDULE
+    app.extensions['celery'] = celery
     
-    return celery
\ No newline at end of file
+    return celery
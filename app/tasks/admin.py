@@ -0,0 +1,27 @@
+# app/tasks/admin.py
+"""
+Задачи административных действий
+"""
+
+from celery import shared_task
+
+
+@shared_task(bind=True, max_retries=3)
+def log_admin_action(self, admin_id, target_user_id, action, reason=None):
+    """
+    Запись административного действия в журнал
+    
+    Args:
+        admin_id: ID администратора
+        target_user_id: ID пользователя
+        action: Действие (block/unblock/promote/demote/warn)
+        reason: Причина
+    """
+    from app.blueprints.admin.services import AdminService
+    
+    try:
+        AdminService._log_admin_action(admin_id, target_user_id, action, reason)
+        return {'user_id': target_user_id, 'action': action}
+    except Exception as exc:
+        # Повторяем задачу с экспоненциальной задержкой
+        self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
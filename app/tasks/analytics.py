@@ -3,17 +3,15 @@
 Задачи для аналитики и статистики
 """
 
-from celery import Celery
+from celery import shared_task
 from datetime import datetime, timedelta
 from app.extensions import db
 from app.models.listing import Listing
 from app.models.user import User
 from sqlalchemy import func
 
-celery = Celery('kolesa_analytics')
 
-
-@celery.task
+@shared_task
 def calculate_daily_stats():
     """Вычисление ежедневной статистики"""
     today = datetime.utcnow().date()
@@ -41,7 +39,7 @@ def calculate_daily_stats():
     return stats
 
 
-@celery.task
+@shared_task
 def update_listing_scores():
     """Обновление рейтингов объявлений"""
     from app.utils.helpers import calculate_listing_score
@@ -62,7 +60,7 @@ def update_listing_scores():
     return {'updated_scores': updated_count}
 
 
-@celery.task
+@shared_task
 def generate_user_recommendations(user_id):
     """Генерация рекомендаций для пользователя"""
     user = User.query.get(user_id)
@@ -92,7 +90,7 @@ def generate_user_recommendations(user_id):
     }
 
 
-@celery.task
+@shared_task
 def send_weekly_digest():
     """Отправка еженедельного дайджеста пользователям"""
     # Получаем пользователей, подписанных на дайджест
@@ -155,10 +153,37 @@ def get_popular_listings_for_user(user):
     return [listing.to_dict() for listing in popular]
 
 
-# Периодические задачи (настраиваются в Celery Beat)
+@shared_task
+def refresh_admin_stats():
+    """Обновление снимка счетчиков дашборда администратора"""
+    from app.blueprints.admin.services import AdminService
+    
+    AdminService.refresh_stats_snapshot()
+    return {'refreshed_at': datetime.utcnow().isoformat()}
+
+
+@shared_task
+def reconcile_unread_counts():
+    """Пересчет разошедшихся счетчиков непрочитанных диалогов"""
+    from app.blueprints.conversations.services import ConversationService
+    
+    return {'fixed_counts': ConversationService.reconcile_unread_counts()}
+
+
+@shared_task
+def refresh_car_caches():
+    """Прогрев кэша автомобильных справочников до истечения TTL"""
+    from app.blueprints.cars.services import CarService
+    
+    CarService.get_brands_with_models.refresh()
+    CarService.get_car_hierarchy.refresh()
+    return {'refreshed_at': datetime.utcnow().isoformat()}
+
+
+# Периодические задачи (подключаются к Celery Beat в init_celery)
 from celery.schedules import crontab
 
-celery.conf.beat_schedule = {
+BEAT_SCHEDULE = {
     'daily-cleanup': {
         'task': 'app.tasks.cleanup.daily_cleanup',
         'schedule': crontab(hour=2, minute=0),  # Каждый день в 2:00
@@ -167,6 +192,18 @@ celery.conf.beat_schedule = {
         'task': 'app.tasks.indexing.update_search_vectors',
         'schedule': crontab(hour=3, minute=0),  # Каждый день в 3:00
     },
+    'refresh-admin-stats': {
+        'task': 'app.tasks.analytics.refresh_admin_stats',
+        'schedule': 60.0,  # Каждую минуту
+    },
+    'reconcile-unread-counts': {
+        'task': 'app.tasks.analytics.reconcile_unread_counts',
+        'schedule': crontab(minute=30),  # Каждый час
+    },
+    'refresh-car-caches': {
+        'task': 'app.tasks.analytics.refresh_car_caches',
+        'schedule': 50 * 60.0,  # Каждые 50 минут (TTL кэша - час)
+    },
     'calculate-daily-stats': {
         'task': 'app.tasks.analytics.calculate_daily_stats',
         'schedule': crontab(hour=1, minute=0),  # Каждый день в 1:00
@@ -0,0 +1,66 @@
+# app/tasks/auth.py
+"""
+Задачи аутентификации
+"""
+
+from celery import shared_task
+from app.models.user import LoginAttempt
+
+
+@shared_task(bind=True, max_retries=3)
+def log_login_attempt(self, identifier, ip_address, success, user_agent=None, failure_reason=None):
+    """
+    Запись попытки входа в журнал login_attempts
+    
+    Args:
+        identifier: Телефон или email
+        ip_address: IP адрес
+        success: Успешна ли попытка
+        user_agent: User-Agent клиента
+        failure_reason: Причина неудачи
+    """
+    try:
+        LoginAttempt.log_attempt(
+            identifier=identifier,
+            ip_address=ip_address,
+            success=success,
+            user_agent=user_agent,
+            failure_reason=failure_reason
+        )
+    except Exception as exc:
+        # Повторяем задачу с экспоненциальной задержкой
+        self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
+
+
+@shared_task(bind=True, max_retries=3)
+def send_phone_verification_task(self, phone_number, ip_address=None):
+    """
+    Создание кода верификации и отправка SMS
+    
+    Args:
+        phone_number: Нормализованный номер телефона
+        ip_address: IP адрес запроса
+    """
+    from app.blueprints.auth.services import AuthService
+    
+    try:
+        AuthService.deliver_phone_verification(phone_number, ip_address)
+    except Exception as exc:
+        self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
+
+
+@shared_task(bind=True, max_retries=3)
+def send_email_verification_task(self, user_id, email):
+    """
+    Создание токена верификации и отправка письма
+    
+    Args:
+        user_id: ID пользователя
+        email: Нормализованный email
+    """
+    from app.blueprints.auth.services import AuthService
+    
+    try:
+        AuthService.deliver_email_verification(user_id, email)
+    except Exception as exc:
+        self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
@@ -3,17 +3,15 @@
 Задачи для очистки данных
 """
 
-from celery import Celery
+from celery import shared_task
 from datetime import datetime, timedelta
 from app.extensions import db
 from app.models.listing import Listing
 from app.models.user import UserSession, LoginAttempt, PhoneVerification
 from app.models.media import MediaStorage
 
-celery = Celery('kolesa_cleanup')
 
-
-@celery.task
+@shared_task
 def cleanup_expired_listings():
     """Очистка истекших объявлений"""
     expired_date = datetime.utcnow()
@@ -37,7 +35,7 @@ def cleanup_expired_listings():
     return {'expired_listings': count}
 
 
-@celery.task
+@shared_task
 def cleanup_old_sessions():
     """Очистка старых сессий"""
     expiry_date = datetime.utcnow()
@@ -51,7 +49,7 @@ def cleanup_old_sessions():
     return {'deleted_sessions': deleted_count}
 
 
-@celery.task
+@shared_task
 def cleanup_old_login_attempts():
     """Очистка старых попыток входа"""
     cutoff_date = datetime.utcnow() - timedelta(days=30)
@@ -65,7 +63,7 @@ def cleanup_old_login_attempts():
     return {'deleted_attempts': deleted_count}
 
 
-@celery.task
+@shared_task
 def cleanup_old_verifications():
     """Очистка старых кодов верификации"""
     cutoff_date = datetime.utcnow() - timedelta(hours=24)
@@ -79,7 +77,7 @@ def cleanup_old_verifications():
     return {'deleted_verifications': deleted_count}
 
 
-@celery.task
+@shared_task
 def cleanup_orphaned_media():
     """Очистка медиа файлов без связанных сущностей"""
     import os
@@ -101,7 +99,7 @@ def cleanup_orphaned_media():
     return {'deleted_media_files': count}
 
 
-@celery.task
+@shared_task
 def daily_cleanup():
     """Ежедневная очистка данных"""
     results = {}
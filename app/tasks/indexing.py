@@ -3,15 +3,13 @@
 Задачи для индексации и поиска
 """
 
-from celery import Celery
+from celery import shared_task
 from app.extensions import db
 from app.models.listing import Listing
 from sqlalchemy import text
 
-celery = Celery('kolesa_indexing')
 
-
-@celery.task
+@shared_task
 def update_search_vectors():
     """Обновление поисковых векторов для объявлений"""
     # Обновляем search_vector для всех активных объявлений
@@ -27,7 +25,7 @@ def update_search_vectors():
     return {'updated_vectors': result.rowcount}
 
 
-@celery.task
+@shared_task
 def reindex_listing(listing_id):
     """Переиндексация конкретного объявления"""
     listing = Listing.query.get(listing_id)
@@ -52,7 +50,7 @@ def reindex_listing(listing_id):
     return {'listing_id': listing_id, 'reindexed': True}
 
 
-@celery.task
+@shared_task
 def rebuild_search_index():
     """Полная переиндексация всех объявлений"""
     query = text("""
@@ -3,7 +3,7 @@
 Задачи для отправки уведомлений
 """
 
-from celery import Celery
+from celery import shared_task
 from flask import current_app
 from app.extensions import db
 from app.models.user import User, DeviceRegistration
@@ -12,10 +12,7 @@ import requests
 import json
 
 
-celery = Celery('kolesa_notifications')
-
-
-@celery.task(bind=True, max_retries=3)
+@shared_task(bind=True, max_retries=3)
 def send_push_notification(self, user_id, title, message, data=None):
     """
     Отправка push-уведомления
@@ -93,7 +90,7 @@ def send_apns_notification(device_token, title, message, data=None):
     return {'success': True, 'message': 'APNS integration not implemented'}
 
 
-@celery.task(bind=True, max_retries=3)
+@shared_task(bind=True, max_retries=3)
 def send_email_notification(self, user_id, template_code, template_data=None):
     """
     Отправка email уведомления
@@ -140,7 +137,7 @@ def send_email_notification(self, user_id, template_code, template_data=None):
         self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
 
 
-@celery.task(bind=True, max_retries=3)
+@shared_task(bind=True, max_retries=3)
 def send_sms_notification(self, user_id, message_text):
     """
     Отправка SMS уведомления
@@ -167,7 +164,7 @@ def send_sms_notification(self, user_id, message_text):
         self.retry(countdown=60 * (2 ** self.request.retries), exc=exc)
 
 
-@celery.task
+@shared_task
 def send_bulk_notifications(user_ids, notification_type, template_code, template_data=None):
     """
     Массовая отправка уведомлений
@@ -198,7 +195,7 @@ def send_bulk_notifications(user_ids, notification_type, template_code, template
     return {'sent_to_users': len(results), 'task_results': results}
 
 
-@celery.task(bind=True, max_retries=3)
+@shared_task(bind=True, max_retries=3)
 def send_notification_task(self, notification_id):
     """Отправка уведомления"""
     session = get_db_session()
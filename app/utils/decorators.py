@@ -12,18 +12,21 @@ from app.utils.exceptions import (
     UserNotFoundError, format_validation_error
 )
 from app.models.user import User
+from app.utils.rate_limit import increment_counter
 
 
 def validate_json(schema_class):
     """Декоратор для валидации JSON данных с помощью Marshmallow схемы"""
     def decorator(f):
+        # Схема создается один раз при декорировании, а не на каждый запрос
+        schema = schema_class()
+        
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not request.is_json:
                 raise ValidationError("Request must be JSON")
             
             try:
-                schema = schema_class()
                 validated_data = schema.load(request.json or {})
                 g.validated_data = validated_data
                 return f(*args, **kwargs)
@@ -35,6 +38,36 @@ def validate_json(schema_class):
     return decorator
 
 
+class CurrentUser:
+    """
+    Текущий пользователь запроса
+    
+    user_id берется из JWT; строка users загружается только при первом
+    обращении к другим атрибутам, поэтому маршрутам, которым нужен лишь
+    user_id, запрос к БД не требуется.
+    """
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._user = None
+    
+    def load(self):
+        """Загрузка ORM объекта пользователя (один раз за запрос)"""
+        if self._user is None:
+            from app.extensions import db
+            self._user = db.session.get(User, self.user_id)
+        return self._user
+    
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+    
+    def __setattr__(self, name, value):
+        if name in ('user_id', '_user'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.load(), name, value)
+
+
 def auth_required(f):
     """Декоратор для проверки аутентификации пользователя"""
     @wraps(f)
@@ -106,20 +139,17 @@ def auth_required(f):
                         'message': 'Token does not contain user identity'
                     }), 401
                 
-                # Получаем пользователя
-                user = User.query.filter(
-                    User.user_id == int(user_id),
-                    User.is_active == True
-                ).first()
-                
-                if not user:
+                # Проверяем активность пользователя (кэшируется)
+                user_id = int(user_id)
+                if not User.is_user_active(user_id):
                     return jsonify({
                         'error': 'User not found',
                         'message': 'User not found or inactive'
                     }), 401
                 
-                # Сохраняем пользователя в g для использования в роуте
-                g.current_user = user
+                # Сохраняем пользователя в g для использования в роуте;
+                # строка пользователя загружается при первом обращении
+                g.current_user = CurrentUser(user_id)
                 
                 return f(*args, **kwargs)
                 
@@ -230,31 +260,20 @@ def listing_owner_required(f):
 def rate_limit_by_user(limit_key, max_requests=10, window_minutes=60):
     """Декоратор для ограничения запросов по пользователю"""
     def decorator(f):
+        # Префикс ключа и окно вычисляются один раз при декорировании
+        key_prefix = f"rate_limit:{limit_key}:"
+        window_seconds = window_minutes * 60
+        
         @wraps(f)
         @auth_required
         def decorated_function(*args, **kwargs):
-            from app.extensions import cache
             from app.utils.exceptions import RateLimitError
-            import time
             
-            user_id = g.current_user.user_id
-            cache_key = f"rate_limit:{limit_key}:{user_id}"
+            cache_key = f"{key_prefix}{g.current_user.user_id}"
             
-            # Получаем текущие запросы
-            current_requests = cache.get(cache_key) or []
-            current_time = time.time()
-            window_start = current_time - (window_minutes * 60)
-            
-            # Фильтруем запросы в пределах окна
-            recent_requests = [req_time for req_time in current_requests if req_time > window_start]
-            
-            if len(recent_requests) >= max_requests:
+            if increment_counter(cache_key, window_seconds) > max_requests:
                 raise RateLimitError(f"Rate limit exceeded: {max_requests} requests per {window_minutes} minutes")
             
-            # Добавляем текущий запрос
-            recent_requests.append(current_time)
-            cache.set(cache_key, recent_requests, timeout=window_minutes * 60)
-            
             return f(*args, **kwargs)
         
         return decorated_function
@@ -263,26 +282,18 @@ def rate_limit_by_user(limit_key, max_requests=10, window_minutes=60):
 
 def rate_limit_by_ip(limit_key, max_requests=10, window_minutes=60):
     def decorator(f):
+        key_prefix = f"rate_limit:{limit_key}:"
+        window_seconds = window_minutes * 60
+        
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            from app.extensions import cache
             from app.utils.exceptions import RateLimitError
-            import time
-            
-            ip = request.remote_addr
-            cache_key = f"rate_limit:{limit_key}:{ip}"
             
-            current_requests = cache.get(cache_key) or []
-            current_time = time.time()
-            window_start = current_time - (window_minutes * 60)
-            recent_requests = [t for t in current_requests if t > window_start]
+            cache_key = f"{key_prefix}{request.remote_addr}"
             
-            if len(recent_requests) >= max_requests:
+            if increment_counter(cache_key, window_seconds) > max_requests:
                 raise RateLimitError(f"Rate limit exceeded: {max_requests} requests per {window_minutes} minutes")
             
-            recent_requests.append(current_time)
-            cache.set(cache_key, recent_requests, timeout=window_minutes * 60)
-            
             return f(*args, **kwargs)
         
         return decorated_function
@@ -290,22 +301,26 @@ def rate_limit_by_ip(limit_key, max_requests=10, window_minutes=60):
 
 
 def cache_response(timeout=300, key_prefix=None):
-    """Декоратор для кэширования ответов"""
+    """
+    Декоратор для кэширования ответов
+    
+    В кэше хранится уже сериализованное тело ответа и его ETag: попадание
+    в кэш не вызывает ни представление, ни jsonify, а клиент с актуальным
+    If-None-Match получает 304 без тела.
+    """
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
+            from flask import Response, make_response
             from app.extensions import cache
             import hashlib
             
-            # Генерируем ключ кэша
-            if key_prefix:
-                cache_key = f"{key_prefix}:{request.endpoint}"
-            else:
-                cache_key = f"cache:{request.endpoint}"
+            # Генерируем ключ кэша (путь включает параметры URL)
+            cache_key = f"{key_prefix or 'cache'}:{request.path}"
             
             # Добавляем параметры запроса к ключу
             if request.args:
-                args_str = str(sorted(request.args.items()))
+                args_str = str(sorted(request.args.items(multi=True)))
                 args_hash = hashlib.md5(args_str.encode()).hexdigest()
                 cache_key += f":{args_hash}"
             
@@ -315,12 +330,49 @@ def cache_response(timeout=300, key_prefix=None):
             
             # Проверяем кэш
             cached_response = cache.get(cache_key)
-            if cached_response:
-                return cached_response
+            if cached_response is None:
+                response = make_response(f(*args, **kwargs))
+                # Кэшируются только успешные ответы
+                if response.status_code != 200:
+                    return response
+                
+                body = response.get_data()
+                cached_response = (body, response.mimetype, hashlib.md5(body).hexdigest())
+                cache.set(cache_key, cached_response, timeout=timeout)
             
-            # Выполняем функцию и кэшируем результат
-            response = f(*args, **kwargs)
-            cache.set(cache_key, response, timeout=timeout)
+            body, mimetype, etag = cached_response
+            response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            
+            return response.make_conditional(request)
+        
+        return decorated_function
+    return decorator
+
+
+def http_cache(max_age=3600, public=True):
+    """
+    Декоратор для заголовков HTTP кэширования (браузер и CDN)
+    
+    Ставится поверх cache_response, который выставляет ETag и отвечает 304
+    на If-None-Match. Ответы с ошибками не кэшируются.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from flask import make_response
+            
+            response = make_response(f(*args, **kwargs))
+            
+            if response.status_code in (200, 304):
+                if public:
+                    response.cache_control.public = True
+                else:
+                    response.cache_control.private = True
+                response.cache_control.max_age = max_age
+                # Время хранения на edge кэше (Fastly, Varnish)
+                if public:
+                    response.headers['Surrogate-Control'] = f'max-age={max_age}'
             
             return response
         
@@ -328,6 +380,67 @@ def cache_response(timeout=300, key_prefix=None):
     return decorator
 
 
+def singleflight_cache(timeout=3600, lock_timeout=10, poll_interval=0.05):
+    """
+    Декоратор для кэширования результата функции с защитой от лавины промахов
+    
+    При промахе результат вычисляет только получивший блокировку (cache.add),
+    остальные ждут и перечитывают кэш. Если блокировка не освободилась
+    за lock_timeout секунд, ожидающий вычисляет результат сам.
+    
+    decorated.refresh(*args, **kwargs) пересчитывает и перезаписывает значение
+    в кэше (для прогрева фоновой задачей до истечения TTL).
+    """
+    def decorator(f):
+        def make_key(args, kwargs):
+            import hashlib
+            
+            args_str = repr((args, sorted(kwargs.items())))
+            return f"singleflight:{f.__module__}.{f.__qualname__}:{hashlib.md5(args_str.encode()).hexdigest()}"
+        
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from app.extensions import cache
+            import time
+            
+            cache_key = make_key(args, kwargs)
+            lock_key = f"{cache_key}:lock"
+            
+            result = cache.get(cache_key)
+            if result is not None:
+                return result
+            
+            deadline = time.monotonic() + lock_timeout
+            while not cache.add(lock_key, True, timeout=lock_timeout):
+                time.sleep(poll_interval)
+                
+                result = cache.get(cache_key)
+                if result is not None:
+                    return result
+                
+                if time.monotonic() >= deadline:
+                    break
+            
+            try:
+                result = f(*args, **kwargs)
+                cache.set(cache_key, result, timeout=timeout)
+            finally:
+                cache.delete(lock_key)
+            
+            return result
+        
+        def refresh(*args, **kwargs):
+            from app.extensions import cache
+            
+            result = f(*args, **kwargs)
+            cache.set(make_key(args, kwargs), result, timeout=timeout)
+            return result
+        
+        decorated_function.refresh = refresh
+        return decorated_function
+    return decorator
+
+
 def log_api_call(f):
     """Декоратор для логирования API вызовов"""
     @wraps(f)
@@ -371,14 +484,14 @@ def handle_errors(f):
             logger = logging.getLogger(__name__)
             
             if isinstance(e, BaseAppException):
-                logger.warning(f"Application error: {e.message}")
+                logger.warning("Application error on %s %s: %s", request.method, request.path, e.message)
                 return jsonify({
                     'error': e.__class__.__name__,
                     'message': e.message
                 }), e.code
             
             elif isinstance(e, SQLAlchemyError):
-                logger.error(f"Database error: {str(e)}")
+                logger.error("Database error on %s %s: %s", request.method, request.path, e)
                 handled_error = handle_db_error(e)
                 return jsonify({
                     'error': handled_error.__class__.__name__,
@@ -386,7 +499,8 @@ def handle_errors(f):
                 }), handled_error.code
             
             else:
-                logger.error(f"Unexpected error: {str(e)}")
+                # Трассировка нужна только для непредвиденных ошибок
+                logger.error("Unexpected error on %s %s: %s", request.method, request.path, e, exc_info=True)
                 return jsonify({
                     'error': 'InternalServerError',
                     'message': 'An unexpected error occurred'
@@ -5,10 +5,11 @@
 
 import re
 import secrets
+from functools import lru_cache
 import string
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any
-from flask import request, url_for
+from flask import g, has_app_context, request, url_for
 import phonenumbers
 from phonenumbers import NumberParseException
 from email_validator import validate_email, EmailNotValidError
@@ -28,9 +29,10 @@ def generate_secure_token(length=32):
     return secrets.token_urlsafe(length)
 
 
+@lru_cache(maxsize=65536)
 def normalize_phone_number(phone_number: str, default_country='KZ') -> str:
     """
-    Нормализация номера телефона
+    Нормализация номера телефона (результат кэшируется)
     
     Args:
         phone_number: Номер телефона
@@ -60,6 +62,25 @@ def normalize_phone_number(phone_number: str, default_country='KZ') -> str:
         raise ValueError("Invalid phone number format")
 
 
+@lru_cache(maxsize=65536)
+def try_normalize_phone(phone_number: str, default_country='KZ') -> Optional[str]:
+    """
+    Нормализация номера телефона без исключений
+    
+    Returns:
+        Нормализованный номер или None, если номер некорректный
+        (неудачный результат тоже кэшируется)
+    """
+    if not phone_number or not any(char.isdigit() for char in phone_number):
+        return None
+    
+    try:
+        return normalize_phone_number(phone_number, default_country)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
 def validate_email_address(email: str) -> str:
     """
     Валидация и нормализация email адреса
@@ -68,7 +89,7 @@ def validate_email_address(email: str) -> str:
         email: Email адрес
         
     Returns:
-        Нормализованный email
+        Нормализованный email (результат кэшируется)
         
     Raises:
         ValueError: Если email некорректный
@@ -298,6 +319,22 @@ def get_client_ip() -> str:
     return ip or '127.0.0.1'
 
 
+def get_utc_today() -> date:
+    """
+    Текущая дата (UTC), вычисляемая один раз за запрос
+    
+    Returns:
+        Дата, сохраненная в g на время контекста приложения
+    """
+    if not has_app_context():
+        return datetime.utcnow().date()
+    
+    if 'utc_today' not in g:
+        g.utc_today = datetime.utcnow().date()
+    
+    return g.utc_today
+
+
 def get_user_agent() -> str:
     """
     Получение User-Agent клиента
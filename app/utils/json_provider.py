@@ -0,0 +1,31 @@
+# app/utils/json_provider.py
+"""
+JSON провайдер Flask на базе orjson
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON провайдер, использующий orjson вместо стандартного модуля json"""
+    
+    # Наивные datetime сериализуются как isoformat(), без суффикса часового пояса
+    option = orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        """Сериализация объекта в JSON строку"""
+        option = self.option
+        
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        
+        # Decimal, UUID и прочие типы обрабатывает стандартный default Flask
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        """Десериализация JSON строки"""
+        return orjson.loads(s)
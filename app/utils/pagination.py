@@ -3,16 +3,37 @@
 Утилиты для пагинации результатов
 """
 
-from typing import Dict, List, Any, Optional
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from flask import request, url_for
+from sqlalchemy import DateTime, and_, or_, func
 from sqlalchemy.orm import Query
 
 
+def serialize_item(item: Any) -> Any:
+    """
+    Сериализация элемента страницы
+    
+    ORM объекты сериализуются через to_dict(), строки результата
+    колоночных запросов (Row) - через _asdict() без создания ORM объектов.
+    """
+    if hasattr(item, 'to_dict'):
+        return item.to_dict()
+    if hasattr(item, '_asdict'):
+        return item._asdict()
+    if hasattr(item, '__dict__'):
+        return item.__dict__
+    return str(item)
+
+
 class Pagination:
     """Класс для работы с пагинацией"""
     
     def __init__(self, query: Query, page: int, per_page: int, 
-                 error_out: bool = True, max_per_page: int = 100):
+                 error_out: bool = True, max_per_page: int = 100,
+                 total: Optional[int] = None):
         """
         Инициализация пагинации
         
@@ -22,6 +43,7 @@ class Pagination:
             per_page: Количество элементов на странице
             error_out: Выбрасывать ошибку при некорректных параметрах
             max_per_page: Максимальное количество элементов на странице
+            total: Заранее известное количество элементов (без SELECT count(*))
         """
         self.query = query
         self.page = max(1, page) if page > 0 else 1
@@ -30,7 +52,7 @@ class Pagination:
         self.max_per_page = max_per_page
         
         # Вычисляем общее количество элементов
-        self.total = self.query.count()
+        self.total = self.query.count() if total is None else total
         
         # Вычисляем общее количество страниц
         self.total_pages = (self.total + self.per_page - 1) // self.per_page
@@ -157,16 +179,7 @@ class Pagination:
         
         if serialize_items:
             # Пытаемся сериализовать элементы
-            items = []
-            for item in self.items:
-                if hasattr(item, 'to_dict'):
-                    items.append(item.to_dict())
-                elif hasattr(item, '__dict__'):
-                    items.append(item.__dict__)
-                else:
-                    items.append(str(item))
-            
-            data['items'] = items
+            data['items'] = [serialize_item(item) for item in self.items]
         
         return data
 
@@ -250,22 +263,162 @@ class CursorPagination:
         }
         
         if serialize_items:
-            items = []
-            for item in self.items:
-                if hasattr(item, 'to_dict'):
-                    items.append(item.to_dict())
-                elif hasattr(item, '__dict__'):
-                    items.append(item.__dict__)
-                else:
-                    items.append(str(item))
+            data['items'] = [serialize_item(item) for item in self.items]
+        
+        return data
+
+
+class KeysetPagination:
+    """
+    Keyset (seek) пагинация по нескольким колонкам
+    
+    Вместо OFFSET страница выбирается условием "строго после последней
+    строки предыдущей страницы", поэтому стоимость запроса не зависит
+    от глубины страницы.
+    """
+    
+    def __init__(self, query: Query, order_by: Sequence[Tuple[Any, str]],
+                 after: str = None, per_page: int = 20, max_per_page: int = 100):
+        """
+        Инициализация keyset пагинации
+        
+        Args:
+            query: SQLAlchemy Query объект
+            order_by: Список пар (колонка, 'asc' | 'desc'); последняя колонка
+                должна быть уникальной (обычно первичный ключ). Для колонок
+                с NULL третий элемент 'nulls_last': строки с NULL идут последними
+                и корректно учитываются в курсоре
+            after: Непрозрачный курсор последней строки предыдущей страницы
+            per_page: Количество элементов на странице
+            max_per_page: Максимальное количество элементов на странице
+        """
+        self.order_by = [
+            (spec[0], spec[1].lower(), len(spec) > 2 and spec[2] == 'nulls_last')
+            for spec in order_by
+        ]
+        self.after = after or None
+        self.per_page = min(max(1, per_page), max_per_page)
+        
+        if self.after:
+            values = decode_cursor(self.after)
+            if len(values) != len(self.order_by):
+                from app.utils.exceptions import ValidationError
+                raise ValidationError("Invalid pagination cursor")
+            query = query.filter(self._seek_condition(values))
+        
+        query = query.order_by(*[
+            self._order_clause(column, direction, nulls_last)
+            for column, direction, nulls_last in self.order_by
+        ])
+        
+        # Получаем элементы (+1 для проверки наличия следующей страницы)
+        self._items = query.limit(self.per_page + 1).all()
+    
+    @staticmethod
+    def _order_clause(column, direction: str, nulls_last: bool):
+        """Выражение ORDER BY для колонки"""
+        clause = column.desc() if direction == 'desc' else column.asc()
+        return clause.nulls_last() if nulls_last else clause
+    
+    def _seek_condition(self, values: List[Any]):
+        """Условие "после курсора" с учетом направления сортировки каждой колонки"""
+        values = [
+            _parse_cursor_value(column, value)
+            for (column, _, _), value in zip(self.order_by, values)
+        ]
+        conditions = []
+        
+        for i, (column, direction, nulls_last) in enumerate(self.order_by):
+            value = values[i]
+            equal_prefix = [
+                prev_column.is_(None) if values[j] is None else prev_column == values[j]
+                for j, (prev_column, _, _) in enumerate(self.order_by[:i])
+            ]
             
-            data['items'] = items
+            if value is None:
+                # После NULL (они последние) идут только NULL, различаемые следующими колонками
+                continue
+            
+            step = column < value if direction == 'desc' else column > value
+            if nulls_last:
+                step = or_(step, column.is_(None))
+            conditions.append(and_(*equal_prefix, step))
+        
+        return or_(*conditions)
+    
+    @property
+    def items(self) -> List:
+        """Получение элементов текущей страницы"""
+        return self._items[:self.per_page]
+    
+    @property
+    def has_next(self) -> bool:
+        """Есть ли следующая страница"""
+        return len(self._items) > self.per_page
+    
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Курсор для следующей страницы"""
+        if self.has_next and self.items:
+            last_item = self.items[-1]
+            return encode_cursor([
+                getattr(last_item, column.key) for column, _, _ in self.order_by
+            ])
+        return None
+    
+    def to_dict(self, serialize_items: bool = True) -> Dict[str, Any]:
+        """
+        Преобразование в словарь для JSON ответа
+        
+        Args:
+            serialize_items: Сериализовать ли элементы
+            
+        Returns:
+            Словарь с данными пагинации
+        """
+        data = {
+            'after': self.after,
+            'per_page': self.per_page,
+            'has_next': self.has_next,
+            'next_cursor': self.next_cursor
+        }
+        
+        if serialize_items:
+            data['items'] = [serialize_item(item) for item in self.items]
         
         return data
 
 
+def encode_cursor(values: List[Any]) -> str:
+    """Кодирование значений курсора в непрозрачную строку"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Декодирование курсора, созданного encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        values = None
+    
+    if not isinstance(values, list):
+        from app.utils.exceptions import ValidationError
+        raise ValidationError("Invalid pagination cursor")
+    
+    return values
+
+
+def _parse_cursor_value(column, value):
+    """Приведение значения из курсора к типу колонки"""
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
 def paginate_query(query: Query, page: int = None, per_page: int = None,
-                   error_out: bool = True, max_per_page: int = 100) -> Pagination:
+                   error_out: bool = True, max_per_page: int = 100,
+                   total: Optional[int] = None) -> Pagination:
     """
     Вспомогательная функция для пагинации запроса
     
@@ -275,6 +428,7 @@ def paginate_query(query: Query, page: int = None, per_page: int = None,
         per_page: Элементов на странице (из request.args если не указан)
         error_out: Выбрасывать ошибку при некорректных параметрах
         max_per_page: Максимальное количество элементов на странице
+        total: Заранее известное количество элементов
         
     Returns:
         Объект Pagination
@@ -285,7 +439,51 @@ def paginate_query(query: Query, page: int = None, per_page: int = None,
     if per_page is None:
         per_page = request.args.get('per_page', 20, type=int)
     
-    return Pagination(query, page, per_page, error_out, max_per_page)
+    return Pagination(query, page, per_page, error_out, max_per_page, total)
+
+
+def paginate_query_windowed(query: Query, page: int = None, per_page: int = None,
+                            error_out: bool = True, max_per_page: int = 100) -> Pagination:
+    """
+    Пагинация одним запросом: общее количество приходит вместе со строками
+    страницы через count(*) OVER ()
+    
+    Подходит для запросов по одной сущности (Model.query...).
+    
+    Args:
+        query: SQLAlchemy Query объект
+        page: Номер страницы (из request.args если не указан)
+        per_page: Элементов на странице (из request.args если не указан)
+        error_out: Выбрасывать ошибку при некорректных параметрах
+        max_per_page: Максимальное количество элементов на странице
+        
+    Returns:
+        Объект Pagination с уже загруженными элементами
+    """
+    if page is None:
+        page = request.args.get('page', 1, type=int)
+    
+    if per_page is None:
+        per_page = request.args.get('per_page', 20, type=int)
+    
+    page = max(1, page)
+    per_page = min(max(1, per_page), max_per_page)
+    
+    rows = query.add_columns(
+        func.count().over().label('_full_count')
+    ).offset((page - 1) * per_page).limit(per_page).all()
+    
+    if rows:
+        total = rows[0][-1]
+    elif page == 1:
+        total = 0
+    else:
+        # Страница за пределами результата: количество считается отдельно
+        total = query.order_by(None).count()
+    
+    pagination = Pagination(query, page, per_page, error_out, max_per_page, total)
+    pagination._items = [row[0] for row in rows]
+    return pagination
 
 
 def paginate_cursor(query: Query, cursor_field: str = 'id', 
@@ -344,22 +542,24 @@ def build_pagination_links(pagination: Pagination, endpoint: str = None) -> Dict
     return links
 
 
-def create_pagination_response(pagination: Pagination, endpoint: str = None) -> Dict[str, Any]:
+def create_pagination_response(pagination: Pagination, endpoint: str = None,
+                               items: Optional[List[Any]] = None) -> Dict[str, Any]:
     """
     Создание полного ответа с пагинацией
     
     Args:
         pagination: Объект пагинации
         endpoint: Endpoint для ссылок
+        items: Уже сериализованные элементы (иначе - serialize_item)
         
     Returns:
         Словарь с данными и метаинформацией
     """
-    data = pagination.to_dict()
+    data = pagination.to_dict(serialize_items=items is None)
     links = build_pagination_links(pagination, endpoint)
     
     return {
-        'data': data['items'],
+        'data': data['items'] if items is None else items,
         'meta': {
             'pagination': {
                 'page': data['page'],
@@ -369,4 +569,30 @@ def create_pagination_response(pagination: Pagination, endpoint: str = None) ->
             },
             'links': links
         }
-    }
\ No newline at end of file
+    }
+
+
+def create_keyset_pagination_response(pagination: KeysetPagination,
+                                      items: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Создание ответа с keyset пагинацией
+    
+    Args:
+        pagination: Объект keyset пагинации
+        items: Уже сериализованные элементы (иначе - serialize_item)
+        
+    Returns:
+        Словарь с данными и метаинформацией
+    """
+    data = pagination.to_dict(serialize_items=items is None)
+    
+    return {
+        'data': data['items'] if items is None else items,
+        'meta': {
+            'pagination': {
+                'per_page': data['per_page'],
+                'has_next': data['has_next'],
+                'next_cursor': data['next_cursor']
+            }
+        }
+    }
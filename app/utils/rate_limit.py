@@ -0,0 +1,57 @@
+# app/utils/rate_limit.py
+"""
+Счетчики фиксированного окна для ограничения частоты запросов
+"""
+
+from app.extensions import cache
+
+
+# INCR и установка TTL атомарно за один вызов Redis
+_INCREMENT_LUA = """
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return current
+"""
+
+_increment_script = None
+
+
+def _redis_client():
+    """Клиент Redis бэкенда кэша (None для остальных бэкендов)"""
+    return getattr(cache.cache, '_write_client', None)
+
+
+def increment_counter(key, window_seconds):
+    """
+    Увеличение счетчика в текущем окне
+    
+    Args:
+        key: Ключ счетчика
+        window_seconds: Длина окна; TTL выставляется при первом увеличении
+        
+    Returns:
+        Новое значение счетчика
+    """
+    global _increment_script
+    
+    client = _redis_client()
+    if client is not None:
+        # Скрипт регистрируется один раз и вызывается через EVALSHA
+        if _increment_script is None or _increment_script.registered_client is not client:
+            _increment_script = client.register_script(_INCREMENT_LUA)
+        return int(_increment_script(keys=[key], args=[window_seconds * 1000]))
+    
+    # Бэкенды кэша без Redis: счетчик создается с TTL окна и увеличивается
+    cache.add(key, 0, timeout=window_seconds)
+    return cache.inc(key)
+
+
+def get_counter(key):
+    """Текущее значение счетчика (0, если окно истекло или счетчика нет)"""
+    client = _redis_client()
+    if client is not None:
+        return int(client.get(key) or 0)
+    
+    return cache.get(key) or 0
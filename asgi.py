@@ -0,0 +1,15 @@
+# asgi.py
+"""
+ASGI точка входа для запуска приложения под Uvicorn
+
+    uvicorn asgi:asgi_app --workers 4
+"""
+import os
+from asgiref.wsgi import WsgiToAsgi
+from app import create_app
+from app.config import config
+
+config_name = os.environ.get('FLASK_ENV', 'development')
+app = create_app(config[config_name])
+
+asgi_app = WsgiToAsgi(app)
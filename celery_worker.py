@@ -0,0 +1,15 @@
+# celery_worker.py
+"""
+Точка входа Celery worker и beat
+
+    celery -A celery_worker.celery worker
+    celery -A celery_worker.celery beat
+"""
+import os
+from app import create_app
+from app.config import config
+
+config_name = os.environ.get('FLASK_ENV', 'development')
+app = create_app(config[config_name])
+
+celery = app.extensions['celery']